@@ -0,0 +1,254 @@
+import os
+import sys
+import glob
+import json
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+import libsbml as ls
+from sbmlpbkutils import load_config, AnnotationsTemplateGenerator
+from cache.manifest import get_package_versions
+from compile_models import convert_antimony, annotate_model, validate_model, MODELS_PATH
+from simulation.simulator import load_simulator, save_simulator_state
+from simulation.engine import ModelInstanceSimulator
+from tracing.timing import time_best
+from pbk import add_benchmark_arguments, DEFAULT_TOLERANCE, DEFAULT_MIN_DELTA
+
+CONFIGS_PATH = './scenarios/'
+
+# Configure logger for formatted console output
+console_logger = logging.getLogger('benchmark')
+console_logger.setLevel(logging.INFO)
+_console_handler = logging.StreamHandler()
+_console_handler.setLevel(logging.INFO)
+_console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+if not console_logger.handlers:
+    console_logger.addHandler(_console_handler)
+
+def get_environment() -> dict:
+    versions = get_package_versions(
+        'sbmlpbkutils', 'tellurium', 'antimony', 'libroadrunner', 'numpy', 'scipy', 'pandas'
+    )
+    versions['libsbml'] = ls.getLibSBMLDottedVersion()
+    return {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'versions': versions
+    }
+
+def benchmark_model(file: str, work_path: str, repeat: int = 1) -> tuple[dict[str, float], Path]:
+    """Times the compile stages (Antimony conversion, annotation, validation)
+    and loading of a simulator for an Antimony model, writing all outputs to
+    the work folder. Returns the timings per stage and the compiled SBML
+    file."""
+    timings = {}
+    sbml_file = Path(work_path) / Path(file).with_suffix('.sbml').name
+    timings['antimony'], _ = time_best(lambda: convert_antimony(file, sbml_file), repeat)
+
+    # Use a template if the model has no annotations file yet, rather than
+    # writing one next to the model
+    annotations_file = Path(file).with_suffix('.annotations.csv')
+    if not annotations_file.exists():
+        annotations_file = Path(work_path) / annotations_file.name
+        AnnotationsTemplateGenerator().generate(ls.readSBML(str(sbml_file)).getModel()) \
+            .to_csv(annotations_file, index=False)
+
+    def annotate():
+        document = ls.readSBML(str(sbml_file))
+        annotate_model(document, annotations_file, sbml_file.with_suffix('.annotations.log'))
+        return document
+
+    timings['annotate'], document = time_best(annotate, repeat)
+    ls.writeSBML(document, str(sbml_file))
+    timings['validate'], _ = time_best(
+        lambda: validate_model(sbml_file, sbml_file.with_suffix('.validation.log')),
+        repeat
+    )
+    timings['load'], rr = time_best(lambda: load_simulator(sbml_file, use_cache=False), repeat)
+    save_simulator_state(rr, sbml_file)
+    timings['load_cached'], _ = time_best(lambda: load_simulator(sbml_file), repeat)
+    return timings, sbml_file
+
+def benchmark_sbml_model(sbml_file: str, repeat: int = 1) -> dict[str, float]:
+    """Times validation and simulator loading of an SBML model without an
+    Antimony source."""
+    with tempfile.TemporaryDirectory() as work_path:
+        timings = {}
+        timings['validate'], _ = time_best(
+            lambda: validate_model(sbml_file, Path(work_path) / 'validation.log'),
+            repeat
+        )
+        timings['load'], _ = time_best(lambda: load_simulator(sbml_file, use_cache=False), repeat)
+    return timings
+
+def benchmark_scenarios(
+    file: str,
+    compiled: dict[str, Path],
+    repeat: int = 1,
+    model_pattern: str = None
+) -> dict[str, float]:
+    """Times the simulation of each scenario of a config for each model
+    instance. Models compiled by the benchmark are used instead of the model
+    files of the config, if available."""
+    config = load_config(file)
+    timings = {}
+    for model_instance in config.model_instances:
+        if model_pattern and model_pattern not in model_instance.model_path:
+            continue
+        model_key = Path(os.path.relpath(model_instance.model_path, MODELS_PATH)).as_posix()
+        if model_key in compiled:
+            model_instance.model_path = str(compiled[model_key])
+        simulator = ModelInstanceSimulator(model_instance)
+        for scenario in config.scenarios:
+            timings[f"{scenario.id}:{model_instance.id}"], _ = time_best(
+                lambda: simulator.simulate(scenario),
+                repeat
+            )
+    return timings
+
+def run_benchmarks(repeat: int = 1, model_pattern: str = None, simulate: bool = True) -> dict:
+    """Runs the benchmarks of all models and scenarios. Returns the results
+    as a dict with the environment, a flat dict of timings (seconds) keyed by
+    "<file>:<stage>" and the errors per file."""
+    models = sorted(glob.glob(f'./{MODELS_PATH}/**/*.ant', recursive=True))
+    sbml_models = [
+        file for file in sorted(glob.glob(f'./{MODELS_PATH}/**/*.sbml', recursive=True))
+        if not os.path.exists(Path(file).with_suffix('.ant'))
+    ]
+    if model_pattern:
+        models = [file for file in models if model_pattern in file]
+        sbml_models = [file for file in sbml_models if model_pattern in file]
+    configs = sorted(glob.glob(f'./{CONFIGS_PATH}/**/*.yaml', recursive=True)) if simulate else []
+
+    timings = {}
+    errors = {}
+    work_path = tempfile.mkdtemp(prefix='benchmark-')
+    try:
+        compiled = {}
+        for file in models + sbml_models:
+            key = Path(os.path.relpath(file, MODELS_PATH)).as_posix()
+            console_logger.info("Benchmarking model [%s].", key)
+            try:
+                if file in models:
+                    model_path = os.path.join(work_path, os.path.dirname(key))
+                    os.makedirs(model_path, exist_ok=True)
+                    model_timings, sbml_file = benchmark_model(file, model_path, repeat)
+                    compiled[Path(key).with_suffix('.sbml').as_posix()] = sbml_file
+                else:
+                    model_timings = benchmark_sbml_model(file, repeat)
+            except Exception as e:
+                console_logger.error("Error benchmarking model [%s]: %s", key, str(e))
+                errors[key] = str(e)
+                continue
+            for stage, seconds in model_timings.items():
+                timings[f"{key}:{stage}"] = seconds
+
+        for file in configs:
+            key = Path(os.path.relpath(file, CONFIGS_PATH)).as_posix()
+            console_logger.info("Benchmarking simulation config [%s].", key)
+            try:
+                scenario_timings = benchmark_scenarios(file, compiled, repeat, model_pattern)
+            except Exception as e:
+                console_logger.error("Error benchmarking simulation config [%s]: %s", key, str(e))
+                errors[key] = str(e)
+                continue
+            for name, seconds in scenario_timings.items():
+                timings[f"{key}:{name}:simulate"] = seconds
+    finally:
+        shutil.rmtree(work_path, ignore_errors=True)
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'repeat': repeat,
+        'environment': get_environment(),
+        'timings': timings,
+        'errors': errors
+    }
+
+def compare_with_baseline(
+    results: dict,
+    baseline: dict,
+    tolerance: float = DEFAULT_TOLERANCE,
+    min_delta: float = DEFAULT_MIN_DELTA
+) -> list[dict]:
+    """Compares the timings with those of a baseline. Returns the timings
+    that are slower than the baseline by more than the relative tolerance
+    and the minimal absolute difference, sorted by absolute slowdown."""
+    regressions = []
+    for key, seconds in results['timings'].items():
+        reference = baseline.get('timings', {}).get(key)
+        if reference is None:
+            continue
+        if seconds > reference * (1 + tolerance) and seconds - reference > min_delta:
+            regressions.append({
+                'key': key,
+                'baseline': reference,
+                'time': seconds,
+                'ratio': seconds / reference if reference > 0 else float('inf')
+            })
+    return sorted(regressions, key=lambda r: r['baseline'] - r['time'])
+
+def log_benchmark_summary(results: dict, baseline: dict = None, regressions: list[dict] = None):
+    console_logger.info(
+        "Benchmarked %d timings, %d errors.",
+        len(results['timings']),
+        len(results['errors'])
+    )
+    for key, message in results['errors'].items():
+        console_logger.error("  [FAILED]     %s: %s", key, message)
+    if baseline is None:
+        return
+    baseline_timings = baseline.get('timings', {})
+    missing = [key for key in baseline_timings if key not in results['timings']]
+    added = [key for key in results['timings'] if key not in baseline_timings]
+    console_logger.info(
+        "Compared with baseline of %s: %d regressions, %d new and %d missing timings.",
+        baseline.get('created', 'unknown date'),
+        len(regressions),
+        len(added),
+        len(missing)
+    )
+    for regression in regressions:
+        console_logger.warning(
+            "  [REGRESSION] %s: %.3fs -> %.3fs (%.2fx)",
+            regression['key'],
+            regression['baseline'],
+            regression['time'],
+            regression['ratio']
+        )
+    if baseline.get('environment') != results['environment']:
+        console_logger.warning("Environment differs from the baseline; timings may not be comparable.")
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark compiling, loading and simulating the models and scenarios.'
+    )
+    add_benchmark_arguments(parser)
+    return parser.parse_args()
+
+def run(args):
+    results = run_benchmarks(
+        repeat=max(1, args.repeat),
+        model_pattern=args.models,
+        simulate=not args.no_simulate
+    )
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    baseline = None
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance, args.min_delta)
+    log_benchmark_summary(results, baseline, regressions)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
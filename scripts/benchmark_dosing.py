@@ -0,0 +1,204 @@
+import os
+import sys
+import csv
+import copy
+import glob
+import tempfile
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from sbmlpbkutils import load_config, run_config
+from simulation.engine import ModelInstanceSimulator, ScenarioResult
+from tracing.timing import time_best
+
+CONFIGS_PATH = './scenarios/'
+
+# Maximum difference between the engine and run_config, relative to the range
+# of each output
+DEFAULT_TOLERANCE = 1e-3
+
+# Time column of the text results of run_config, which has one table per
+# scenario and model instance with one column per output id
+RUN_CONFIG_TIME_COLUMN = 'time'
+
+# Configure logger for formatted console output
+console_logger = logging.getLogger('benchmark_dosing')
+console_logger.setLevel(logging.INFO)
+_console_handler = logging.StreamHandler()
+_console_handler.setLevel(logging.INFO)
+_console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+if not console_logger.handlers:
+    console_logger.addHandler(_console_handler)
+
+def get_run_config_results_file(out_path: str, scenario_id: str, model_instance_id: str) -> str:
+    return os.path.join(out_path, f"{scenario_id}_{model_instance_id}.csv")
+
+def read_run_config_results(out_path: str, config, scenario) -> list[ScenarioResult]:
+    """Reads the text results that run_config wrote to out_path for a
+    scenario. Columns are matched on their exact names. Raises a ValueError
+    if a results file or column is missing, if a column name occurs more
+    than once, or if the time column does not span the scenario duration
+    (i.e., is not in the time unit of the scenario)."""
+    time_unit = getattr(scenario.time_unit, 'value', scenario.time_unit)
+    results = []
+    for model_instance in config.model_instances:
+        file = get_run_config_results_file(out_path, scenario.id, model_instance.id)
+        if not os.path.isfile(file):
+            raise ValueError(
+                f"Results file [{os.path.basename(file)}] of model instance [{model_instance.id}] not found "
+                f"in the output of run_config ({sorted(os.listdir(out_path))})."
+            )
+        with open(file, 'r', newline='', encoding='utf-8') as f:
+            names = [name.strip() for name in next(csv.reader(f), [])]
+        indices = []
+        for name in [RUN_CONFIG_TIME_COLUMN] + [output.id for output in scenario.outputs]:
+            count = names.count(name)
+            if count != 1:
+                raise ValueError(
+                    f"Column [{name}] {'not found' if count == 0 else 'found more than once'} in results "
+                    f"file [{os.path.basename(file)}] of run_config (columns: {names})."
+                )
+            indices.append(names.index(name))
+        data = pd.read_csv(file, header=None, skiprows=1).iloc[:, indices].to_numpy(dtype=float)
+        time = data[:, 0]
+        if len(time) == 0 or time[0] != 0 or not np.isclose(time[-1], float(scenario.duration)):
+            raise ValueError(
+                f"Time column of results file [{os.path.basename(file)}] of run_config does not span the "
+                f"scenario duration [0, {scenario.duration}] {time_unit}."
+            )
+        results.append(ScenarioResult(
+            model_instance_id=model_instance.id,
+            output_ids=[output.id for output in scenario.outputs],
+            time=time,
+            values=data[:, 1:]
+        ))
+    return results
+
+def get_max_relative_difference(result, reference) -> float:
+    """Returns the maximum difference between the outputs of two scenario
+    results, relative to the range of each output of the reference. Values
+    are interpolated to the time points of the reference if these differ."""
+    values = result.values
+    if len(result.time) != len(reference.time) or not np.allclose(result.time, reference.time):
+        values = np.column_stack([
+            np.interp(reference.time, result.time, result.values[:, j])
+            for j in range(result.values.shape[1])
+        ])
+    scale = np.max(np.abs(reference.values), axis=0)
+    return float(np.max(np.abs(values - reference.values) / np.where(scale > 0, scale, 1.), initial=0.))
+
+def benchmark_config(file: str, repeat: int = 1) -> list[dict]:
+    """Times each scenario of a simulation config with run_config and with
+    the segmented dosing engine, using the ODE solver and the automatically
+    selected solver, and compares the outputs of both engine solvers with
+    those of run_config. Engine timings exclude loading the models, which is
+    done once per config."""
+    config = load_config(file)
+    simulators = [ModelInstanceSimulator(m) for m in config.model_instances]
+    logger = logging.getLogger('benchmark_dosing.run_config')
+    logger.disabled = True
+    rows = []
+    for scenario in config.scenarios:
+        scenario_config = copy.copy(config)
+        scenario_config.scenarios = [scenario]
+
+        def run_reference():
+            with tempfile.TemporaryDirectory() as out_path:
+                run_config(
+                    config = scenario_config,
+                    out_path = out_path,
+                    logger = logger,
+                    force_recompute = True
+                )
+                return read_run_config_results(out_path, config, scenario)
+
+        reference_time, reference_results = time_best(run_reference, repeat)
+        ode_time, ode_results = time_best(
+            lambda: [s.simulate(scenario, solver='ode') for s in simulators],
+            repeat
+        )
+        auto_time, auto_results = time_best(
+            lambda: [s.simulate(scenario) for s in simulators],
+            repeat
+        )
+
+        rows.append({
+            'config': file,
+            'scenario': scenario.id,
+            'doses': len(simulators[0].get_dosing_schedule(scenario)) if simulators else 0,
+            'run_config': reference_time,
+            'segmented_ode': ode_time,
+            'segmented_auto': auto_time,
+            'max_rel_difference': max(
+                (
+                    get_max_relative_difference(result, reference)
+                    for results in (ode_results, auto_results)
+                    for result, reference in zip(results, reference_results)
+                ),
+                default=0.
+            )
+        })
+    return rows
+
+def log_benchmark_results(rows: list[dict], tolerance: float = DEFAULT_TOLERANCE) -> int:
+    """Logs the timings and differences of the scenarios. Returns the number
+    of scenarios of which the engine differs from run_config by more than
+    the tolerance."""
+    console_logger.info(
+        "%-30s %7s %12s %12s %12s %9s %9s",
+        'Scenario', 'Doses', 'run_config', 'Segmented', 'Auto', 'Speedup', 'Max diff'
+    )
+    num_failed = 0
+    for row in rows:
+        failed = row['max_rel_difference'] > tolerance
+        num_failed += failed
+        (console_logger.error if failed else console_logger.info)(
+            "%-30s %7d %11.3fs %11.3fs %11.3fs %8.1fx %9.1e",
+            row['scenario'],
+            row['doses'],
+            row['run_config'],
+            row['segmented_ode'],
+            row['segmented_auto'],
+            row['run_config'] / row['segmented_auto'],
+            row['max_rel_difference']
+        )
+    if num_failed:
+        console_logger.error(
+            "%d scenarios differ from run_config by more than %g (relative to the output range).",
+            num_failed,
+            tolerance
+        )
+    return num_failed
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the segmented dosing engine against run_config on the simulation configs.'
+    )
+    parser.add_argument(
+        'configs',
+        nargs='*',
+        help=f'simulation config files (default: all configs in {CONFIGS_PATH})'
+    )
+    parser.add_argument(
+        '-r', '--repeat',
+        type=int,
+        default=1,
+        help='number of repetitions of which the fastest is reported (default: 1)'
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help='maximum difference with run_config relative to the output range (default: %(default)s)'
+    )
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    configs = args.configs or sorted(glob.glob(f'./{CONFIGS_PATH}/**/*.yaml', recursive=True))
+    rows = []
+    for file in configs:
+        console_logger.info(f"Benchmarking simulation config {file}")
+        rows += benchmark_config(file, repeat=max(1, args.repeat))
+    sys.exit(1 if log_benchmark_results(rows, args.tolerance) else 0)
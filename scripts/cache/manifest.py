@@ -0,0 +1,98 @@
+import os
+import json
+import hashlib
+import importlib.metadata
+from pathlib import Path
+
+def get_package_versions(*packages: str) -> dict[str, str]:
+    """Returns the installed versions of the specified packages."""
+    versions = {}
+    for package in packages:
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = 'unknown'
+    return versions
+
+def file_hash(file: str | Path) -> str | None:
+    """Returns the SHA-256 hex digest of the file contents, or None if the
+    file does not exist."""
+    if not os.path.exists(file):
+        return None
+    digest = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_object(obj) -> str:
+    """Returns the SHA-256 hex digest of the canonical JSON representation of
+    a JSON-serialisable object."""
+    data = json.dumps(obj, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+class BuildManifest:
+    """JSON manifest recording, per build target, the hashes of its input
+    files and the versions of the toolchain used to build it."""
+
+    def __init__(self, path: str | Path, versions: dict[str, str]):
+        self.path = Path(path)
+        self.versions = dict(versions)
+        self.entries = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get('entries', {})
+            except (OSError, ValueError):
+                # Corrupt or unreadable manifest: rebuild everything
+                self.entries = {}
+
+    def get_outdated_reason(
+        self,
+        key: str,
+        inputs: dict[str, str | None],
+        outputs: list[str | Path] = None
+    ) -> str | None:
+        """Returns the reason why the target identified by key needs to be
+        rebuilt, or None if it is up to date."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return 'not built before'
+        recorded_versions = entry.get('versions', {})
+        changed_versions = [
+            f"{name} {recorded_versions.get(name, '?')} -> {version}"
+            for name, version in self.versions.items()
+            if recorded_versions.get(name) != version
+        ]
+        if changed_versions:
+            return f"toolchain changed: {', '.join(changed_versions)}"
+        recorded_inputs = entry.get('inputs', {})
+        changed_inputs = sorted(
+            name for name in set(recorded_inputs) | set(inputs)
+            if recorded_inputs.get(name) != inputs.get(name)
+        )
+        if changed_inputs:
+            return f"inputs changed: {', '.join(changed_inputs)}"
+        missing_outputs = [
+            os.path.basename(output) for output in (outputs or [])
+            if not os.path.exists(output)
+        ]
+        if missing_outputs:
+            return f"outputs missing: {', '.join(missing_outputs)}"
+        return None
+
+    def update(self, key: str, inputs: dict[str, str | None]):
+        self.entries[key] = {
+            'inputs': dict(inputs),
+            'versions': dict(self.versions)
+        }
+
+    def remove(self, key: str):
+        self.entries.pop(key, None)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({ 'entries': self.entries }, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, self.path)
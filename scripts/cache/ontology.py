@@ -0,0 +1,39 @@
+import os
+import atexit
+from pathlib import Path
+
+ONTOLOGY_CACHE_FILE = './.cache/ontologies/quadstore.sqlite3'
+
+_cache_file = None
+
+def enable_ontology_cache(cache_file: str | Path = ONTOLOGY_CACHE_FILE) -> bool:
+    """Stores the ontologies that are loaded through owlready2 (used by
+    sbmlpbkutils to resolve PBPKO and ChEBI terms) in a persistent quadstore.
+    Ontologies that are in the quadstore are read from disk instead of being
+    downloaded and parsed again, also by other processes and in later runs.
+    Ontologies that were already loaded in memory are copied into the
+    quadstore. Returns whether the cache is enabled."""
+    global _cache_file
+    if _cache_file is not None:
+        return True
+    try:
+        import owlready2
+    except ImportError:
+        return False
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    try:
+        # Non-exclusive, so that worker processes can share the quadstore
+        owlready2.default_world.set_backend(filename=str(cache_file), exclusive=False)
+    except Exception:
+        # E.g., a corrupt quadstore or one locked by another process
+        return False
+    _cache_file = cache_file
+    atexit.register(save_ontology_cache)
+    return True
+
+def save_ontology_cache():
+    """Writes ontologies loaded since the cache was enabled to the quadstore."""
+    if _cache_file is None:
+        return
+    import owlready2
+    owlready2.default_world.save()
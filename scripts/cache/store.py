@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+class DirectoryCache:
+    """Persistent cache storing, per key, a directory with output files."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+
+    def get(self, key: str) -> Path | None:
+        """Returns the cached directory for the key, or None on a cache miss."""
+        entry_dir = self.path / key
+        return entry_dir if entry_dir.is_dir() else None
+
+    def put(self, key: str, source_dir: str | Path) -> Path:
+        """Stores a copy of the contents of source_dir under the key, replacing
+        any existing entry."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        entry_dir = self.path / key
+        # Copy to a temporary folder first so that readers (and concurrent
+        # writers of the same key) never see a partially written entry
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.path, prefix=f".{key}."))
+        shutil.copytree(source_dir, tmp_dir, dirs_exist_ok=True)
+        if entry_dir.is_dir():
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        try:
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # Entry was stored by another process in the meantime
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return entry_dir
+
+    def prune(self, keys: set[str]):
+        """Removes all entries whose key is not in keys."""
+        if not self.path.is_dir():
+            return
+        for entry_dir in self.path.iterdir():
+            if entry_dir.is_dir() and entry_dir.name not in keys:
+                shutil.rmtree(entry_dir, ignore_errors=True)
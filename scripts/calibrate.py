@@ -0,0 +1,72 @@
+import sys
+import glob
+import logging
+import argparse
+from sbmlpbkutils import load_config
+from simulation.calibration import run_calibration, load_calibration_spec, write_calibrated_param_file
+from tracing.trace import span, enable_tracing, finish_tracing
+from pbk import add_calibrate_arguments
+
+CALIBRATIONS_PATH = './calibrations/'
+
+# Configure logger for formatted console output
+console_logger = logging.getLogger('calibrate')
+console_logger.setLevel(logging.INFO)
+_console_handler = logging.StreamHandler()
+_console_handler.setLevel(logging.INFO)
+_console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+if not console_logger.handlers:
+    console_logger.addHandler(_console_handler)
+
+def calibrate(spec_file: str, jobs: int = 1) -> bool:
+    console_logger.info(f"Running calibration [{spec_file}].")
+    try:
+        spec = load_calibration_spec(spec_file)
+        config = load_config(spec['config'])
+        model_instance = next(
+            (m for m in config.model_instances if m.id == spec['model_instance']),
+            None
+        )
+        if model_instance is None:
+            raise ValueError(f"Model instance [{spec['model_instance']}] not found in config [{spec['config']}].")
+        with span('calibrate', spec_file, model_instance=model_instance.id):
+            result = run_calibration(spec_file, jobs=jobs)
+        with span('write', spec_file):
+            out_file = write_calibrated_param_file(model_instance.param_file, result)
+    except Exception as error:
+        console_logger.error("Calibration [%s] failed: %s", spec_file, error)
+        return False
+
+    console_logger.info(
+        "Calibration [%s]: objective %.4g -> %.4g (%d simulations).",
+        spec_file,
+        result.initial_objective,
+        result.objective,
+        result.num_evaluations
+    )
+    for parameter_id, initial, value in zip(result.parameter_ids, result.initial_values, result.values):
+        console_logger.info("  %s: %.4g -> %.4g", parameter_id, initial, value)
+    console_logger.info(f"Written calibrated parameterisation [{out_file}].")
+    return True
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Calibrate model parameters against observed data.')
+    add_calibrate_arguments(parser)
+    return parser.parse_args()
+
+def run(args):
+    if args.trace:
+        enable_tracing()
+    try:
+        spec_files = args.specs or sorted(glob.glob(f'{CALIBRATIONS_PATH}**/*.yaml', recursive=True))
+        failed = [
+            spec_file for spec_file in spec_files
+            if not calibrate(spec_file, jobs=max(1, args.jobs))
+        ]
+    finally:
+        if args.trace:
+            finish_tracing(args.trace, console_logger)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
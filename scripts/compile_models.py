@@ -1,15 +1,23 @@
 import os
+import sys
 import glob
 import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 import uuid
-import tellurium as te
+import antimony
 import libsbml as ls
-from sbmlpbkutils import PbkModelValidator, AnnotationsTemplateGenerator, PbkModelAnnotator,\
-    ParametrisationsTemplateGenerator
+from cache.manifest import BuildManifest, file_hash, get_package_versions
+from cache.ontology import enable_ontology_cache, save_ontology_cache
+from docs.unit_checks import check_unit_consistency, write_unit_checks, get_unit_checks_file
+from tracing.trace import span, enable_tracing, finish_tracing
+from pbk import add_compile_arguments
 
 MODELS_PATH = './models/'
 OUTPUT_PATH = './models/'
+BUILD_MANIFEST_FILE = './models/.build-manifest.json'
 
 # Configure logger for formatted console output
 console_logger = logging.getLogger('compile_models')
@@ -29,32 +37,185 @@ def create_file_logger(logfile: Path) -> logging.Logger:
     logger.addHandler(fh)
     return logger
 
-def compile_models():
-    models = glob.glob('./models/**/*.ant', recursive=True)
+def close_file_logger(logger: logging.Logger):
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
+
+@dataclass
+class CompileResult:
+    file: str
+    success: bool
+    message: str = ''
+    skipped: bool = False
+
+def get_toolchain_versions() -> dict[str, str]:
+    versions = get_package_versions('sbmlpbkutils', 'antimony')
+    versions['libsbml'] = ls.getLibSBMLDottedVersion()
+    # Changes to this script also change the compiled models
+    versions['compile_models'] = file_hash(__file__)
+    return versions
+
+def get_sbml_file(file: str) -> Path:
+    output_dir = os.path.join(OUTPUT_PATH, os.path.relpath(os.path.dirname(file), MODELS_PATH))
+    return Path(os.path.join(output_dir, os.path.basename(file))).with_suffix('.sbml')
+
+def get_model_input_hashes(file: str) -> dict[str, str | None]:
+    return {
+        os.path.basename(input_file): file_hash(input_file)
+        for input_file in [
+            file,
+            Path(file).with_suffix('.annotations.csv'),
+            Path(file).with_suffix('.params.csv')
+        ]
+    }
+
+def compile_models(jobs: int = 1, force: bool = False, models: list[str] = None):
+    models = sorted(models or glob.glob('./models/**/*.ant', recursive=True))
+    manifest = BuildManifest(BUILD_MANIFEST_FILE, get_toolchain_versions())
+
+    # Determine which models are outdated
+    results = {}
+    outdated = []
     for file in models:
-        compile_model(file)
+        key = Path(os.path.relpath(file, MODELS_PATH)).as_posix()
+        reason = 'forced rebuild' if force else manifest.get_outdated_reason(
+            key,
+            get_model_input_hashes(file),
+            outputs=[get_sbml_file(file), get_unit_checks_file(get_sbml_file(file))]
+        )
+        if reason is None:
+            console_logger.info("Skipping model file [%s]: up to date.", os.path.basename(file))
+            results[file] = CompileResult(file, True, 'up to date', skipped=True)
+        else:
+            console_logger.info("Compiling model file [%s]: %s.", os.path.basename(file), reason)
+            outdated.append(file)
+
+    if jobs > 1 and len(outdated) > 1:
+        # Load the ontologies into the persistent ontology cache in a separate
+        # process first, so that the workers read them from disk rather than
+        # each loading them and writing them to the cache concurrently
+        with span('ontology'), ProcessPoolExecutor(max_workers=1) as executor:
+            executor.submit(load_ontologies).result()
+        console_logger.info("Compiling %d models using %d worker processes.", len(outdated), jobs)
+        with ProcessPoolExecutor(max_workers=jobs, initializer=enable_ontology_cache) as executor:
+            # Executor map yields results in submission order
+            compiled = list(executor.map(compile_model, outdated))
+    elif outdated:
+        enable_ontology_cache()
+        compiled = [compile_model(file) for file in outdated]
+        save_ontology_cache()
+    else:
+        compiled = []
+
+    # Record inputs of compiled models (after templates may have been
+    # generated) in the build manifest; failed models are retried next run
+    for result in compiled:
+        key = Path(os.path.relpath(result.file, MODELS_PATH)).as_posix()
+        if result.success:
+            manifest.update(key, get_model_input_hashes(result.file))
+        else:
+            manifest.remove(key)
+        results[result.file] = result
+    manifest.save()
+
+    results = [results[file] for file in models]
+    log_compile_summary(results)
+    return results
+
+def log_compile_summary(results: list[CompileResult]):
+    num_failed = len([r for r in results if not r.success])
+    num_skipped = len([r for r in results if r.skipped])
+    console_logger.info(
+        "Processed %d models: %d compiled, %d skipped, %d failed.",
+        len(results),
+        len(results) - num_failed - num_skipped,
+        num_skipped,
+        num_failed
+    )
+    for result in results:
+        if result.skipped:
+            console_logger.info("  [SKIPPED] %s: %s", result.file, result.message)
+        elif result.success:
+            console_logger.info("  [OK]      %s", result.file)
+        else:
+            console_logger.error("  [FAILED]  %s: %s", result.file, result.message)
+
+# Annotator and validator shared by all models compiled in the process, so
+# that the ontologies they use are loaded once
+_annotator = None
+_validator = None
+
+def get_annotator():
+    # The sbmlpbkutils stack is only imported when models are compiled
+    global _annotator
+    if _annotator is None:
+        from sbmlpbkutils import PbkModelAnnotator
+        _annotator = PbkModelAnnotator()
+    return _annotator
+
+def get_validator():
+    global _validator
+    if _validator is None:
+        from sbmlpbkutils import PbkModelValidator
+        _validator = PbkModelValidator()
+    return _validator
+
+def load_ontologies():
+    if enable_ontology_cache():
+        get_annotator()
+        get_validator()
+        save_ontology_cache()
+
+def convert_antimony(file: str, sbml_file: Path):
+    """Converts an Antimony model file to SBML, without loading a simulator."""
+    antimony.clearPreviousLoads()
+    if antimony.loadAntimonyFile(str(file)) < 0:
+        raise ValueError(antimony.getLastError())
+    if antimony.writeSBMLFile(str(sbml_file), antimony.getMainModuleName()) != 1:
+        raise ValueError(antimony.getLastError())
+
+def annotate_model(document: ls.SBMLDocument, annotations_file: Path, log_file: Path):
+    annotator = get_annotator()
+    logger = create_file_logger(log_file)
+    try:
+        annotator.annotate(
+            document,
+            str(annotations_file),
+            logger = logger
+        )
+    finally:
+        close_file_logger(logger)
 
-def compile_model(file: str):
+def validate_model(sbml_file: Path, log_file: Path):
+    validator = get_validator()
+    logger = create_file_logger(log_file)
+    try:
+        validator.validate(str(sbml_file), logger)
+    finally:
+        close_file_logger(logger)
+
+def compile_model(file: str) -> CompileResult:
     try:
         filename = os.path.basename(file)
-        file_dir = os.path.dirname(file)
+        item = Path(os.path.relpath(file, MODELS_PATH)).as_posix()
 
         # Create output directory if it does not exist
-        output_dir = os.path.join(OUTPUT_PATH, os.path.relpath(file_dir, MODELS_PATH))
-        os.makedirs(output_dir, exist_ok=True)
+        sbml_file = get_sbml_file(file)
+        os.makedirs(sbml_file.parent, exist_ok=True)
 
         # Convert Antimony to SBML
-        sbml_file = Path(os.path.join(output_dir, filename)).with_suffix('.sbml')
         console_logger.info(
             "Creating SBML file [%s] from Antimony file [%s].",
             os.path.basename(sbml_file),
             filename
         )
-        r = te.loada(file)
-        r.exportToSBML(sbml_file, current = False)
+        with span('antimony', item):
+            convert_antimony(file, sbml_file)
 
         # Annotate SBML model
-        document = ls.readSBML(sbml_file)
+        with span('readSBML', item):
+            document = ls.readSBML(sbml_file)
         annotations_file = Path(file).with_suffix('.annotations.csv')
         if not os.path.exists(annotations_file):
             # create annotations (csv) file if it does not exist
@@ -62,6 +223,7 @@ def compile_model(file: str):
                 "Annotations file not found: creating annotations file [%s].",
                 os.path.basename(annotations_file)
             )
+            from sbmlpbkutils import AnnotationsTemplateGenerator
             model = document.getModel()
             annotations_template_generator = AnnotationsTemplateGenerator()
             annotations = annotations_template_generator.generate(model)
@@ -69,20 +231,20 @@ def compile_model(file: str):
 
         # Create annotated SBML file
         annotated_sbml_file = Path(sbml_file).with_suffix('.sbml')
-        annotator = PbkModelAnnotator()
         annotations_log_file = Path(sbml_file).with_suffix('.annotations.log')
-        logger = create_file_logger(annotations_log_file)
         console_logger.info(
             "Creating annotated SBML file [%s] with annotations file [%s].",
             os.path.basename(annotated_sbml_file),
             os.path.basename(annotations_file)
         )
-        annotator.annotate(
-            document,
-            str(annotations_file),
-            logger = logger
-        )
-        ls.writeSBML(document, str(annotated_sbml_file))
+        with span('annotate', item):
+            annotate_model(document, annotations_file, annotations_log_file)
+        with span('writeSBML', item):
+            ls.writeSBML(document, str(annotated_sbml_file))
+
+        # Check unit consistency once, for use in the model docs
+        with span('unit_check', item):
+            write_unit_checks(annotated_sbml_file, check_unit_consistency(document))
 
         # Create parametrisations file
         parametrisation_file = Path(sbml_file).with_suffix('.params.csv')
@@ -92,6 +254,7 @@ def compile_model(file: str):
                 "Parametrisations file not found: creating parametrisations file [%s].",
                 os.path.basename(parametrisation_file)
             )
+            from sbmlpbkutils import ParametrisationsTemplateGenerator
             model = document.getModel()
             parametrisations_template_generator = ParametrisationsTemplateGenerator()
             (_, parametrisations) = parametrisations_template_generator.generate(model)
@@ -99,13 +262,29 @@ def compile_model(file: str):
 
         # Validate annotated SBML file
         validation_log_file = Path(sbml_file).with_suffix('.validation.log')
-        validator = PbkModelValidator()
-        logger = create_file_logger(validation_log_file)
-        validator.validate(str(annotated_sbml_file), logger)
+        with span('validate', item):
+            validate_model(annotated_sbml_file, validation_log_file)
 
     except Exception as e:
         console_logger.error("Error processing model file [%s]: %s", os.path.basename(file), str(e))
+        return CompileResult(file, False, str(e))
 
-if __name__ == '__main__':
-    compile_models()
+    return CompileResult(file, True)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compile Antimony models to annotated SBML.')
+    add_compile_arguments(parser)
+    return parser.parse_args()
+
+def run(args):
+    if args.trace:
+        enable_tracing()
+    try:
+        results = compile_models(jobs=max(1, args.jobs), force=args.force, models=args.models)
+    finally:
+        if args.trace:
+            finish_tracing(args.trace, console_logger)
+    return 1 if args.strict and any(not r.success for r in results) else 0
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
@@ -1,19 +1,30 @@
-import glob
 import os
+import sys
 import re
 import logging
+import argparse
 import zipfile
 from pathlib import Path
 import libsbml as ls
 import yaml
 import pandas as pd
-from sbmlpbkutils import PbkModelReportGenerator, PbkModelInfosExtractor, RenderMode, \
-    DiagramCreator, NamesDisplay
+from sbmlpbkutils import PbkModelReportGenerator, PbkModelInfosExtractor, RenderMode
 
 from docs.utils import render_template
+from docs.catalog import ModelCatalog
+from docs.catalog_index import CatalogIndex
+from docs.unit_checks import get_unit_checks
+from docs.diagrams import DiagramRequest, DiagramResult, get_diagram_key, create_diagram, create_diagrams
+from parameters.store import get_parameter_store, find_parameter_files
+from cache.manifest import BuildManifest, file_hash, get_package_versions
+from cache.ontology import enable_ontology_cache, save_ontology_cache
+from tracing.trace import span, enable_tracing, finish_tracing
+from pbk import add_docs_arguments
 
 MODELS_PATH = './models/'
 OUTPUT_PATH = './docs/models/'
+DOCS_MANIFEST_FILE = os.path.join(OUTPUT_PATH, '.docs-manifest.json')
+CATALOG_INDEX_FILE = os.path.join(OUTPUT_PATH, 'catalog.sqlite')
 
 # Configure logger for formatted console output
 console_logger = logging.getLogger('create_model_docs')
@@ -24,25 +35,119 @@ _console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
 if not console_logger.handlers:
     console_logger.addHandler(_console_handler)
 
-def create_model_reports():
-    # Clear output directory
-    if os.path.exists(OUTPUT_PATH):
-        console_logger.info(f"Clearing output directory: {OUTPUT_PATH}")
-        for root, dirs, files in os.walk(OUTPUT_PATH, topdown=False):
+def get_parameter_files(sbml_file: str) -> list[str]:
+    return find_parameter_files(os.path.dirname(sbml_file))
+
+def get_model_key(sbml_file: str) -> str:
+    return Path(os.path.relpath(sbml_file, MODELS_PATH)).as_posix()
+
+def get_docs_toolchain_versions() -> dict[str, str]:
+    versions = get_package_versions('sbmlpbkutils', 'graphviz', 'pandas', 'PyYAML')
+    versions['libsbml'] = ls.getLibSBMLDottedVersion()
+    # Changes to this script also change the generated pages
+    versions['create_model_docs'] = file_hash(__file__)
+    return versions
+
+def create_model_reports(catalog: ModelCatalog, force: bool = False, jobs: int = 1) -> list[DiagramResult]:
+    os.makedirs(OUTPUT_PATH, exist_ok=True)
+    manifest = BuildManifest(DOCS_MANIFEST_FILE, get_docs_toolchain_versions())
+
+    # Models in the same folder share (and overwrite) the same output pages,
+    # so they are regenerated together
+    keys = set()
+    diagram_requests = []
+    # Manifest entries of regenerated groups, updated once their diagrams
+    # were created
+    updates = {}
+    try:
+        for output_dir, entries in catalog.get_groups().items():
+            key = Path(os.path.relpath(output_dir, OUTPUT_PATH)).as_posix()
+            keys.add(key)
+            inputs = {
+                os.path.basename(file): file_hash(file)
+                for entry in entries
+                for file in [entry.sbml_file] + get_parameter_files(entry.sbml_file)
+            }
+            reason = 'forced rebuild' if force else manifest.get_outdated_reason(
+                key,
+                inputs,
+                outputs=[
+                    os.path.join(output_dir, 'summary.md'),
+                    os.path.join(output_dir, 'summary.svg'),
+                    os.path.join(output_dir, 'metadata.yaml')
+                ]
+            )
+            if reason is None:
+                console_logger.info("Skipping docs for [%s]: up to date.", key)
+                continue
+            console_logger.info("Creating docs for [%s]: %s.", key, reason)
+            first_request = len(diagram_requests)
+            for entry in entries:
+                item = get_model_key(entry.sbml_file)
+                with span('readSBML', item):
+                    document = catalog.get_document(entry)
+                with span('report', item):
+                    create_model_report(entry.sbml_file, document, diagram_requests)
+                with span('metadata', item):
+                    metadata = collect_model_metadata(entry.sbml_file, document)
+                    catalog.set_metadata(entry, metadata)
+            updates[key] = (inputs, { r.name for r in diagram_requests[first_request:] })
+        remove_orphaned_outputs(manifest, keys)
+        # Commit loaded ontologies before diagram workers are forked
+        save_ontology_cache()
+        results = create_model_diagrams(diagram_requests, force, jobs)
+        failed = { r.request.name for r in results if not r.success }
+        for key, (inputs, names) in updates.items():
+            if not names & failed:
+                manifest.update(key, inputs)
+    finally:
+        manifest.save()
+    return results
+
+def create_model_diagrams(requests: list[DiagramRequest], force: bool = False, jobs: int = 1) -> list[DiagramResult]:
+    # Diagrams of models with an unchanged structure are copied from the
+    # diagrams cache; only the others are rendered
+    if jobs > 1:
+        console_logger.info("Creating %d diagrams using %d worker processes.", len(requests), jobs)
+    results = create_diagrams(requests, jobs, force)
+    for result in results:
+        if not result.success:
+            console_logger.error(
+                "Error creating diagram for [%s]: %s",
+                result.request.name,
+                result.message
+            )
+    console_logger.info(
+        "Created %d diagrams: %d rendered, %d from cache, %d failed.",
+        len(results),
+        len([r for r in results if r.success and not r.cached]),
+        len([r for r in results if r.cached]),
+        len([r for r in results if not r.success])
+    )
+    return results
+
+def remove_orphaned_outputs(manifest: BuildManifest, keys: set[str]):
+    # Remove entries and output folders of models that no longer exist; files
+    # at the top level of the output directory are exported by other steps
+    for key in list(manifest.entries):
+        if key not in keys:
+            manifest.remove(key)
+    for root, dirs, files in os.walk(OUTPUT_PATH, topdown=False):
+        key = Path(os.path.relpath(root, OUTPUT_PATH)).as_posix()
+        if key == '.':
+            continue
+        if key not in keys:
             for name in files:
+                console_logger.info("Removing orphaned output file [%s].", os.path.join(root, name))
                 os.remove(os.path.join(root, name))
-            for name in dirs:
-                os.rmdir(os.path.join(root, name))
-    else:
-        os.makedirs(OUTPUT_PATH, exist_ok=True)
-
-    # Generate reports for each model
-    sbml_files = glob.glob('./models/**/*.sbml', recursive=True)
-    for sbml_file in sbml_files:
-        create_model_report(sbml_file)
-        collect_model_metadata(sbml_file)
-
-def create_model_report(sbml_file: str):
+        if not os.listdir(root):
+            os.rmdir(root)
+
+def create_model_report(
+    sbml_file: str,
+    document: ls.SBMLDocument = None,
+    diagram_requests: list[DiagramRequest] = None
+):
     console_logger.info(
         "Creating report for SBML file [%s].",
         os.path.basename(sbml_file)
@@ -65,7 +170,8 @@ def create_model_report(sbml_file: str):
     report_title = re.sub(r'(\D)(\d)', r'\1 \2', report_title)
 
     # Get model from file
-    document = ls.readSBML(sbml_file)
+    if document is None:
+        document = ls.readSBML(sbml_file)
     model = document.getModel()
 
     # Generate report
@@ -90,14 +196,23 @@ def create_model_report(sbml_file: str):
         # Generate and write the diagram
         f.write("## Diagram\n\n")
         diagram_file = Path(report_file).with_suffix('.svg')
-        diagram_creator = DiagramCreator()
-        diagram_creator.create_diagram(
-            generator.document,
-            diagram_file,
-            names_display=NamesDisplay.ELEMENT_IDS_AND_ONTO_IDS,
-            draw_species=True,
-            draw_reaction_ids=True
+        diagram_request = DiagramRequest(
+            name=get_model_key(sbml_file),
+            sbml_file=sbml_file,
+            diagram_file=str(diagram_file),
+            key=get_diagram_key(generator.document)
         )
+        if diagram_requests is not None:
+            # Diagrams are created after all reports, possibly in parallel
+            diagram_requests.append(diagram_request)
+        else:
+            result = create_diagram(diagram_request)
+            if not result.success:
+                console_logger.error(
+                    "Error creating diagram of SBML file [%s]: %s",
+                    os.path.basename(sbml_file),
+                    result.message
+                )
         f.write(f"![Diagram]({diagram_file.name})")
         f.write("\n\n")
 
@@ -183,11 +298,7 @@ def create_model_report(sbml_file: str):
             f.write("*no parameters defined in the model*\n\n")
 
 def export_parameters(sbml_file: str, model: ls.Model, parameters_metadata: list):
-    file_dir = os.path.dirname(sbml_file)
-    parameter_files = sorted(
-        glob.glob(os.path.join(file_dir, '*.param.csv')) +
-        glob.glob(os.path.join(file_dir, '*.params.csv'))
-    )
+    parameter_files = get_parameter_files(sbml_file)
 
     if not parameter_files:
         return []
@@ -202,52 +313,31 @@ def export_parameters(sbml_file: str, model: ls.Model, parameters_metadata: list
         if item.get('id')
     }
 
+    store = get_parameter_store()
     parameterisations = []
     for parameter_file in parameter_files:
         try:
-            df = pd.read_csv(parameter_file, dtype=str).fillna('')
-        except Exception:
+            table = store.get_table(parameter_file)
+        except Exception as e:
+            console_logger.error(
+                "Unable to read parameterisation file [%s]: %s",
+                os.path.basename(parameter_file),
+                str(e)
+            )
             continue
 
-        columns = {column.strip().lower(): column for column in df.columns}
-        parameter_column = columns.get('parameter') or columns.get('id')
-        value_column = columns.get('value')
-        unit_column = columns.get('unit')
-        reference_column = columns.get('reference') or columns.get('description')
+        for issue in store.validate(parameter_file, model):
+            log = console_logger.error if issue.level == 'error' else console_logger.warning
+            log(issue.message)
 
         parameters = []
-        for _, row in df.iterrows():
-            parameter_id = str(row.get(parameter_column, '')).strip() if parameter_column else ''
-            metadata = metadata_lookup.get(parameter_id, {})
-            raw_value = str(row.get(value_column, '')).strip() if value_column else ''
-            unit = str(row.get(unit_column, '')).strip() if unit_column else metadata.get('unit', '')
-            reference = str(row.get(reference_column, '')) if reference_column else ''
-
-            if not raw_value:
-                console_logger.error(
-                    "No value specified for parameter [%s] in parameterisation file [%s] or model [%s].",
-                    parameter_id,
-                    os.path.basename(parameter_file),
-                    os.path.basename(sbml_file)
-                )
-                value = None
-            else:
-                try:
-                    value = float(raw_value)
-                except ValueError:
-                    console_logger.error(
-                        "Unable to parse numeric value [%s] for parameter [%s] in file [%s].",
-                        raw_value,
-                        parameter_id,
-                        os.path.basename(parameter_file)
-                    )
-                    value = None
-
+        for record in table.to_dict('records'):
+            metadata = metadata_lookup.get(record['parameter_id'], {})
             param = {
-                'id': parameter_id,
-                'value': value,
-                'unit': unit,
-                'reference': reference
+                'id': record['parameter_id'],
+                'value': None if pd.isna(record['value']) else record['value'],
+                'unit': record['unit'] if record['unit'] is not None else metadata.get('unit', ''),
+                'reference': record['reference']
             }
 
             pbpko_bqm_is_class = metadata.get('pbpko_bqm_is_class')
@@ -268,34 +358,7 @@ def export_parameters(sbml_file: str, model: ls.Model, parameters_metadata: list
     return parameterisations
 
 
-def get_unit_concistency_check_results(doc: ls.SBMLDocument):
-    results = []
-    doc.setConsistencyChecks(ls.LIBSBML_CAT_UNITS_CONSISTENCY, True)
-    failures = doc.checkConsistencyWithStrictUnits()
-    if failures > 0:
-        for i in range(failures):
-            error = doc.getError(i)
-            error_code = error.getErrorId()
-            severity = error.getSeverity()
-            if severity in { ls.LIBSBML_SEV_ERROR, ls.LIBSBML_SEV_FATAL} \
-                and error_code != ls.UndeclaredUnits:
-                results.append({
-                    "level": "error",
-                    "msg": doc.getError(i).getMessage().strip()
-                })
-            else:
-                results.append({
-                    "level": "warning",
-                    "msg": doc.getError(i).getMessage().strip()
-                })
-    else:
-        results.append({
-            "level": "info",
-            "msg": "No unit inconsistencies found."
-        })
-    return results
-
-def collect_model_metadata(sbml_file: str):
+def collect_model_metadata(sbml_file: str, document: ls.SBMLDocument = None) -> dict:
     file_dir = os.path.dirname(sbml_file)
     output_dir = os.path.join(OUTPUT_PATH, os.path.relpath(file_dir, MODELS_PATH))
     metadata_file = os.path.join(output_dir, 'metadata.yaml')
@@ -307,7 +370,8 @@ def collect_model_metadata(sbml_file: str):
     )
 
     # Load SBML document and get infos extractor
-    document = ls.readSBML(sbml_file)
+    if document is None:
+        document = ls.readSBML(sbml_file)
     model = document.getModel()
     infos_extractor = PbkModelInfosExtractor(document)
 
@@ -395,9 +459,12 @@ def collect_model_metadata(sbml_file: str):
             "iri": item.iri
         })
 
-    unit_consistency_check_results = get_unit_concistency_check_results(document)
+    with span('unit_check', get_model_key(sbml_file)):
+        # Computed when the model was compiled, unless the SBML file changed since
+        unit_consistency_check_results = get_unit_checks(sbml_file, document)
 
-    parametrisations = export_parameters(sbml_file, model, parameters_metadata)
+    with span('export_parameters', get_model_key(sbml_file)):
+        parametrisations = export_parameters(sbml_file, model, parameters_metadata)
 
     # Create metadata dictionary
     metadata = {
@@ -423,70 +490,68 @@ def collect_model_metadata(sbml_file: str):
     with open(metadata_file, "w", encoding="utf-8") as f:
         f.write(yaml_output)
 
-def create_overview_report():
-    sbml_files = glob.glob('./models/**/*.sbml', recursive=True)
+    return metadata
+
+def update_catalog_index(index: CatalogIndex, catalog: ModelCatalog):
+    # Only models of which the metadata file changed are re-indexed
+    updated, removed, missing, failed = index.sync(catalog)
+    for key in missing:
+        console_logger.error(
+            "Metadata file not found for SBML file [%s], model not indexed.",
+            key
+        )
+    for key, error in failed.items():
+        console_logger.error(
+            "Error indexing metadata of SBML file [%s]: %s",
+            key,
+            error
+        )
+    console_logger.info(
+        "Updated catalog index [%s]: %d models indexed, %d removed, %d unchanged, %d failed.",
+        os.path.basename(CATALOG_INDEX_FILE),
+        len(updated),
+        len(removed),
+        len(catalog) - len(updated) - len(missing) - len(failed),
+        len(failed)
+    )
+
+def create_overview_report(index: CatalogIndex):
+    console_logger.info("Collecting models overview from catalog index.")
+    compartments = {}
+    for compartment in index.get_elements('compartments'):
+        compartments.setdefault(compartment['model_key'], []).append({
+            "id": compartment['id'],
+            "pbpko_bqm_is_class": {
+                "id": compartment['bqm_is_class_id'],
+                "label": compartment['bqm_is_class_label'],
+                "iri": compartment['bqm_is_class_iri']
+            } if compartment['bqm_is_class_id'] else None
+        })
+
     records = []
-    for sbml_file in sbml_files:
+    for model in index.get_model_summaries():
         try:
-            console_logger.info(
-                "Processing SBML file [%s] for overview.",
-                os.path.basename(sbml_file)
-            )
-            filename = os.path.basename(sbml_file)
-            file_dir = os.path.dirname(sbml_file)
-            report_path = os.path.relpath(file_dir, MODELS_PATH).replace('\\', '/')
-            route = report_path.split('/')[0]
-            chemical_group = report_path.split('/')[1]
-
-            # Load metadata
-            metadata = None
-            output_dir = os.path.join(OUTPUT_PATH, os.path.relpath(file_dir, MODELS_PATH))
-            metadata_file = os.path.join(output_dir, 'metadata.yaml')
-            with open(metadata_file, "r", encoding="utf-8") as f:
-                metadata = yaml.safe_load(f)
-
-            num_compartments_unannotated = len([
-                s for s in metadata.get('compartments', [])
-                if not s.get('pbpko_bqm_is_class')
-            ])
-            num_species_unannotated = len([
-                s for s in metadata.get('species', [])
-                if not s.get('pbpko_bqm_is_class')
-            ])
-            num_parameters_unannotated = len([
-                p for p in metadata.get('parameters', [])
-                if not p.get('pbpko_bqm_is_class')
-            ])
-            num_unit_consistency_errors = len([
-                r for r in metadata.get('unit_consistency', [])
-                if r.get('level') == 'error'
-            ])
-            num_unit_consistency_warnings = len([
-                r for r in metadata.get('unit_consistency', [])
-                if r.get('level') == 'warning'
-            ])
-
             records.append({
-                "filename": filename,
-                "id": metadata['id'],
-                "name": metadata['name'],
-                "route": route,
-                "chemical_group": chemical_group,
-                "report_path": f"./models/{report_path.replace(' ', '%20')}/summary.md",
-                "compartments": metadata['compartments'],
-                "num_compartments": metadata.get('num_compartments', 'N/A'),
-                "num_compartments_unannotated": num_compartments_unannotated,
-                "num_species": metadata.get('num_species', 'N/A'),
-                "num_species_unannotated": num_species_unannotated,
-                "num_parameters": metadata.get('num_parameters', 'N/A'),
-                "num_parameters_unannotated": num_parameters_unannotated,
-                "num_unit_consistency_errors": num_unit_consistency_errors,
-                "num_unit_consistency_warnings": num_unit_consistency_warnings
+                "filename": model['file'],
+                "id": model['model_id'],
+                "name": model['name'],
+                "route": model['route'],
+                "chemical_group": model['chemical_group'],
+                "report_path": f"./models/{model['report_path'].replace(' ', '%20')}/summary.md",
+                "compartments": compartments.get(model['key'], []),
+                "num_compartments": model['num_compartments'],
+                "num_compartments_unannotated": model['num_compartments_unannotated'],
+                "num_species": model['num_species'],
+                "num_species_unannotated": model['num_species_unannotated'],
+                "num_parameters": model['num_parameters'],
+                "num_parameters_unannotated": model['num_parameters_unannotated'],
+                "num_unit_consistency_errors": model['num_unit_consistency_errors'],
+                "num_unit_consistency_warnings": model['num_unit_consistency_warnings']
             })
         except Exception as e:
             console_logger.error(
                 "Error processing SBML file [%s]: %s",
-                os.path.basename(sbml_file),
+                model['file'],
                 str(e)
             )
 
@@ -542,103 +607,43 @@ def export_models_zip():
     console_logger.info('Zip archive created: %s', zip_file)
 
 
-def export_annotations():
-    sbml_files = glob.glob('./models/**/*.sbml', recursive=True)
+def export_annotations(index: CatalogIndex):
+    element_columns = ['file', 'id', 'name', 'route', 'chemical_group', 'unit']
+    bqm_columns = ['bqm_is_class_id', 'bqm_is_class_label', 'bqm_is_class_iri']
+    bqb_columns = ['bqb_is_class_id', 'bqb_is_class_label', 'bqb_is_class_iri']
+
+    console_logger.info("Collecting model annotations from catalog index.")
     compartment_annotations = []
     species_annotations = []
     parameter_annotations = []
-    for sbml_file in sbml_files:
+    for model in index.get_models():
         try:
-            console_logger.info(
-                "Processing SBML file [%s] for overview.",
-                os.path.basename(sbml_file)
-            )
-            filename = os.path.basename(sbml_file)
-            file_dir = os.path.dirname(sbml_file)
-            report_path = os.path.relpath(file_dir, MODELS_PATH) \
-                .replace('\\', '/')
-            route = report_path.split('/')[0]
-            chemical_group = report_path.split('/')[1]
-
-            # Load metadata
-            metadata = None
-            output_dir = os.path.join(OUTPUT_PATH, os.path.relpath(file_dir, MODELS_PATH))
-            metadata_file = os.path.join(output_dir, 'metadata.yaml')
-            with open(metadata_file, "r", encoding="utf-8") as f:
-                metadata = yaml.safe_load(f)
-
-            for item in metadata.get('compartments', []):
-                pbpko_bqm_is_class = item.get('pbpko_bqm_is_class', None)
-                record = {
-                    'file': filename,
-                    'id': item['id'],
-                    'name': item['name'],
-                    'route': route,
-                    'chemical_group': chemical_group,
-                    'unit': item.get('unit', None),
-                    'bqm_is_class_id': pbpko_bqm_is_class['id'] if pbpko_bqm_is_class else '',
-                    'bqm_is_class_label': pbpko_bqm_is_class['label'] if pbpko_bqm_is_class else '',
-                    'bqm_is_class_iri': pbpko_bqm_is_class['iri'] if pbpko_bqm_is_class else ''
-                }
-                compartment_annotations.append(record)
-
-            for item in metadata.get('species', []):
-                pbpko_bqm_is_class = item.get('pbpko_bqm_is_class', None)
-                chebi_bqb_is_class = item.get('chebi_bqb_is_class', None)
-                record = {
-                    'file': filename,
-                    'id': item['id'],
-                    'name': item['name'],
-                    'route': route,
-                    'chemical_group': chemical_group,
-                    'unit': item.get('unit', None),
-                    'bqm_is_class_id': pbpko_bqm_is_class['id'] if pbpko_bqm_is_class else '',
-                    'bqm_is_class_label': pbpko_bqm_is_class['label'] if pbpko_bqm_is_class else '',
-                    'bqm_is_class_iri': pbpko_bqm_is_class['iri'] if pbpko_bqm_is_class else '',
-                    'bqb_is_class_id': chebi_bqb_is_class['id'] if chebi_bqb_is_class else '',
-                    'bqb_is_class_label': chebi_bqb_is_class['label'] if chebi_bqb_is_class else '',
-                    'bqb_is_class_iri': chebi_bqb_is_class['iri'] if chebi_bqb_is_class else ''
-                }
-                species_annotations.append(record)
-
-            for item in metadata.get('parameters', []):
-                pbpko_bqm_is_class = item.get('pbpko_bqm_is_class', None)
-                chebi_bqb_is_class = item.get('chebi_bqb_is_class', None)
-                record = {
-                    'file': filename,
-                    'id': item['id'],
-                    'name': item['name'],
-                    'route': route,
-                    'chemical_group': chemical_group,
-                    'unit': item.get('unit', None),
-                    'bqm_is_class_id': pbpko_bqm_is_class['id'] if pbpko_bqm_is_class else '',
-                    'bqm_is_class_label': pbpko_bqm_is_class['label'] if pbpko_bqm_is_class else '',
-                    'bqm_is_class_iri': pbpko_bqm_is_class['iri'] if pbpko_bqm_is_class else '',
-                    'bqb_is_class_id': chebi_bqb_is_class['id'] if chebi_bqb_is_class else '',
-                    'bqb_is_class_label': chebi_bqb_is_class['label'] if chebi_bqb_is_class else '',
-                    'bqb_is_class_iri': chebi_bqb_is_class['iri'] if chebi_bqb_is_class else ''
-                }
-                parameter_annotations.append(record)
-
+            compartments = index.get_elements('compartments', model['key'])
+            species = index.get_elements('species', model['key'])
+            parameters = index.get_elements('parameters', model['key'])
         except Exception as e:
             console_logger.error(
                 "Error processing SBML file [%s]: %s",
-                os.path.basename(sbml_file),
+                model['file'],
                 str(e)
             )
+            continue
+        compartment_annotations += compartments
+        species_annotations += species
+        parameter_annotations += parameters
+    df_compartments = pd.DataFrame(compartment_annotations, columns=element_columns + bqm_columns)
+    df_species = pd.DataFrame(species_annotations, columns=element_columns + bqm_columns + bqb_columns)
+    df_parameters = pd.DataFrame(parameter_annotations, columns=element_columns + bqm_columns + bqb_columns)
 
     # Write compartment annotations
-    df_compartments = pd.DataFrame(compartment_annotations)
     compartments_file = os.path.join(OUTPUT_PATH, 'compartments.csv')
     df_compartments.to_csv(compartments_file, sep=',', encoding='utf-8', index=False, header=True)
 
-    # Write compartment annotations
-    df_species = pd.DataFrame(species_annotations)
+    # Write species annotations
     species_file = os.path.join(OUTPUT_PATH, 'species.csv')
     df_species.to_csv(species_file, sep=',', encoding='utf-8', index=False, header=True)
 
-    # Write compartment annotations
-    df_parameters = pd.DataFrame(parameter_annotations)
+    # Write parameter annotations
     parameters_file = os.path.join(OUTPUT_PATH, 'parameters.csv')
     df_parameters.to_csv(parameters_file, sep=',', encoding='utf-8', index=False, header=True)
 
@@ -650,73 +655,77 @@ def export_annotations():
         df_parameters.to_excel(writer, sheet_name='Parameters', index=False, header=True)
 
 
-def export_parameterisations():
-    sbml_files = glob.glob('./models/**/*.sbml', recursive=True)
+def export_parameterisations(index: CatalogIndex):
+    console_logger.info("Collecting parameterisations from catalog index.")
     records = []
-    for sbml_file in sbml_files:
+    for model in index.get_models():
         try:
-            console_logger.info(
-                "Processing SBML file [%s] for parameterisations.",
-                os.path.basename(sbml_file)
-            )
-            file_dir = os.path.dirname(sbml_file)
-            report_path = os.path.relpath(file_dir, MODELS_PATH).replace('\\', '/')
-            path_parts = report_path.split('/')
-            route = path_parts[0] if len(path_parts) > 0 else ''
-            chemical_group = path_parts[1] if len(path_parts) > 1 else ''
-
-            output_dir = os.path.join(OUTPUT_PATH, os.path.relpath(file_dir, MODELS_PATH))
-            metadata_file = os.path.join(output_dir, 'metadata.yaml')
-            if not os.path.exists(metadata_file):
-                console_logger.warning(
-                    "Metadata file not found for SBML file [%s], skipping parameterisations export.",
-                    os.path.basename(sbml_file)
-                )
-                continue
-
-            with open(metadata_file, 'r', encoding='utf-8') as f:
-                metadata = yaml.safe_load(f)
-
-            for parameterisation in metadata.get('parameterisations', []):
-                filename = parameterisation.get('filename', '')
-                model_id = parameterisation.get('model_id', metadata.get('id', ''))
-                for parameter in parameterisation.get('parameters', []):
-                    bqm_is = parameter.get('bqm_is', {})
-                    bqb_is = parameter.get('bqb_is', {})
-                    records.append({
-                        'file': os.path.basename(sbml_file),
-                        'route': route,
-                        'chemical_group': chemical_group,
-                        'model_id': model_id,
-                        'parameterisation_file': filename,
-                        'parameter_id': parameter.get('id', ''),
-                        'value': parameter.get('value', None),
-                        'unit': parameter.get('unit', ''),
-                        'reference': parameter.get('reference', ''),
-                        'bqm_is_id': bqm_is.get('id', '') if isinstance(bqm_is, dict) else str(bqm_is),
-                        'bqm_is_label': bqm_is.get('label', '') if isinstance(bqm_is, dict) else '',
-                        'bqm_is_iri': bqm_is.get('iri', '') if isinstance(bqm_is, dict) else '',
-                        'bqb_is_id': bqb_is.get('id', '') if isinstance(bqb_is, dict) else str(bqb_is),
-                        'bqb_is_label': bqb_is.get('label', '') if isinstance(bqb_is, dict) else '',
-                        'bqb_is_iri': bqb_is.get('iri', '') if isinstance(bqb_is, dict) else ''
-                    })
+            records += index.get_elements('parameterisations', model['key'])
         except Exception as e:
             console_logger.error(
                 "Error exporting parameterisations for SBML file [%s]: %s",
-                os.path.basename(sbml_file),
+                model['file'],
                 str(e)
             )
+    df = pd.DataFrame(
+        records,
+        columns=[
+            'file',
+            'route',
+            'chemical_group',
+            'model_id',
+            'parameterisation_file',
+            'parameter_id',
+            'value',
+            'unit',
+            'reference',
+            'bqm_is_id',
+            'bqm_is_label',
+            'bqm_is_iri',
+            'bqb_is_id',
+            'bqb_is_label',
+            'bqb_is_iri'
+        ]
+    )
 
     excel_file = os.path.join(OUTPUT_PATH, 'parameterisations.xlsx')
-    df = pd.DataFrame(records)
     with pd.ExcelWriter(excel_file) as writer:
         df.to_excel(writer, sheet_name='Parameterisations', index=False, header=True)
 
     console_logger.info('Created parameterisations excel file: %s', excel_file)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Create model documentation pages.')
+    add_docs_arguments(parser)
+    return parser.parse_args()
+
+def run(args):
+    if args.trace:
+        enable_tracing()
+    try:
+        # Ontology terms of the model annotations are resolved from the
+        # persistent ontology cache
+        enable_ontology_cache()
+        catalog = ModelCatalog(MODELS_PATH, OUTPUT_PATH)
+        with span('load_parameters'):
+            # Errors are reported when the models of the files are documented
+            get_parameter_store().load_directory(MODELS_PATH)
+        results = create_model_reports(catalog, force=args.force, jobs=max(1, args.jobs))
+        with CatalogIndex(CATALOG_INDEX_FILE) as index:
+            with span('index'):
+                update_catalog_index(index, catalog)
+            with span('overview'):
+                create_overview_report(index)
+            with span('export_annotations'):
+                export_annotations(index)
+            with span('export_parameterisations'):
+                export_parameterisations(index)
+        with span('export_zip'):
+            export_models_zip()
+    finally:
+        if args.trace:
+            finish_tracing(args.trace, console_logger)
+    return 1 if args.strict and any(not r.success for r in results) else 0
+
 if __name__ == '__main__':
-    create_model_reports()
-    create_overview_report()
-    export_annotations()
-    export_parameterisations()
-    export_models_zip()
+    sys.exit(run(parse_args()))
@@ -0,0 +1,78 @@
+import os
+import glob
+from dataclasses import dataclass
+from pathlib import Path
+import libsbml as ls
+import yaml
+
+@dataclass
+class ModelEntry:
+    # Path of the SBML file relative to the models folder
+    key: str
+    sbml_file: str
+    output_dir: str
+    report_path: str
+    route: str
+    chemical_group: str
+
+    @property
+    def filename(self) -> str:
+        return os.path.basename(self.sbml_file)
+
+class ModelCatalog:
+    """In-memory catalog of the SBML models of the repository. Each SBML
+    document and each metadata file is parsed at most once and shared by
+    all documentation exporters."""
+
+    def __init__(self, models_path: str, output_path: str):
+        self.models_path = models_path
+        self.output_path = output_path
+        self.entries = []
+        sbml_files = sorted(glob.glob(os.path.join(models_path, '**/*.sbml'), recursive=True))
+        for sbml_file in sbml_files:
+            file_dir = os.path.dirname(sbml_file)
+            report_path = Path(os.path.relpath(file_dir, models_path)).as_posix()
+            path_parts = report_path.split('/')
+            self.entries.append(ModelEntry(
+                key=Path(os.path.relpath(sbml_file, models_path)).as_posix(),
+                sbml_file=sbml_file,
+                output_dir=os.path.join(output_path, os.path.relpath(file_dir, models_path)),
+                report_path=report_path,
+                route=path_parts[0] if len(path_parts) > 0 else '',
+                chemical_group=path_parts[1] if len(path_parts) > 1 else ''
+            ))
+        self._documents = {}
+        self._metadata = {}
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_groups(self) -> dict[str, list[ModelEntry]]:
+        """Returns the entries grouped by output directory."""
+        groups = {}
+        for entry in self.entries:
+            groups.setdefault(entry.output_dir, []).append(entry)
+        return groups
+
+    def get_document(self, entry: ModelEntry) -> ls.SBMLDocument:
+        if entry.sbml_file not in self._documents:
+            self._documents[entry.sbml_file] = ls.readSBML(entry.sbml_file)
+        return self._documents[entry.sbml_file]
+
+    def get_metadata(self, entry: ModelEntry) -> dict | None:
+        """Returns the metadata of the output directory of the entry. The
+        metadata is loaded from its metadata.yaml file if it was not set
+        during this run. Returns None if no metadata file exists."""
+        if entry.output_dir not in self._metadata:
+            metadata_file = os.path.join(entry.output_dir, 'metadata.yaml')
+            if not os.path.exists(metadata_file):
+                return None
+            with open(metadata_file, 'r', encoding='utf-8') as f:
+                self._metadata[entry.output_dir] = yaml.safe_load(f)
+        return self._metadata[entry.output_dir]
+
+    def set_metadata(self, entry: ModelEntry, metadata: dict):
+        self._metadata[entry.output_dir] = metadata
@@ -0,0 +1,314 @@
+import os
+import sqlite3
+from pathlib import Path
+from cache.manifest import file_hash
+from docs.catalog import ModelCatalog, ModelEntry
+
+# Version of the table layout; the index is rebuilt if it differs
+SCHEMA_VERSION = 1
+
+ANNOTATION_COLUMNS = """
+    bqm_is_class_id TEXT,
+    bqm_is_class_label TEXT,
+    bqm_is_class_iri TEXT,
+    bqb_is_class_id TEXT,
+    bqb_is_class_label TEXT,
+    bqb_is_class_iri TEXT
+"""
+
+SCHEMA = f"""
+CREATE TABLE models (
+    key TEXT PRIMARY KEY,
+    file TEXT,
+    report_path TEXT,
+    route TEXT,
+    chemical_group TEXT,
+    model_id TEXT,
+    name TEXT,
+    num_compartments INTEGER,
+    num_species INTEGER,
+    num_parameters INTEGER,
+    num_reactions INTEGER,
+    metadata_hash TEXT
+);
+CREATE TABLE chemicals (model_key TEXT, position INTEGER, id TEXT, label TEXT, iri TEXT);
+CREATE TABLE animal_species (model_key TEXT, position INTEGER, id TEXT, label TEXT, iri TEXT);
+CREATE TABLE compartments (model_key TEXT, position INTEGER, id TEXT, name TEXT, unit TEXT, {ANNOTATION_COLUMNS});
+CREATE TABLE species (model_key TEXT, position INTEGER, id TEXT, name TEXT, unit TEXT, {ANNOTATION_COLUMNS});
+CREATE TABLE parameters (model_key TEXT, position INTEGER, id TEXT, name TEXT, unit TEXT, {ANNOTATION_COLUMNS});
+CREATE TABLE parameterisations (
+    model_key TEXT,
+    position INTEGER,
+    parameterisation_file TEXT,
+    model_id TEXT,
+    parameter_id TEXT,
+    value REAL,
+    unit TEXT,
+    reference TEXT,
+    bqm_is_id TEXT,
+    bqm_is_label TEXT,
+    bqm_is_iri TEXT,
+    bqb_is_id TEXT,
+    bqb_is_label TEXT,
+    bqb_is_iri TEXT
+);
+CREATE TABLE unit_checks (model_key TEXT, position INTEGER, level TEXT, msg TEXT);
+CREATE INDEX idx_models_route ON models (route, chemical_group);
+CREATE INDEX idx_chemicals_id ON chemicals (id);
+CREATE INDEX idx_animal_species_id ON animal_species (id);
+CREATE INDEX idx_compartments_bqm ON compartments (bqm_is_class_id);
+CREATE INDEX idx_species_bqm ON species (bqm_is_class_id);
+CREATE INDEX idx_species_bqb ON species (bqb_is_class_id);
+CREATE INDEX idx_parameters_bqm ON parameters (bqm_is_class_id);
+CREATE INDEX idx_parameters_bqb ON parameters (bqb_is_class_id);
+CREATE INDEX idx_parameterisations_parameter ON parameterisations (parameter_id);
+"""
+
+# Tables with records per model, in addition to the models table
+MODEL_TABLES = [
+    'chemicals',
+    'animal_species',
+    'compartments',
+    'species',
+    'parameters',
+    'parameterisations',
+    'unit_checks'
+]
+
+def get_term(term, prefix: str) -> dict:
+    """Returns the id, label and iri of an ontology term of the metadata as
+    columns named <prefix>_id, <prefix>_label and <prefix>_iri."""
+    if isinstance(term, dict):
+        return {
+            f'{prefix}_id': term.get('id', ''),
+            f'{prefix}_label': term.get('label', ''),
+            f'{prefix}_iri': term.get('iri', '')
+        }
+    return {
+        f'{prefix}_id': str(term) if term else '',
+        f'{prefix}_label': '',
+        f'{prefix}_iri': ''
+    }
+
+def get_element_records(items: list[dict]) -> list[dict]:
+    return [
+        {
+            'position': i,
+            'id': item.get('id'),
+            'name': item.get('name'),
+            'unit': item.get('unit'),
+            **get_term(item.get('pbpko_bqm_is_class'), 'bqm_is_class'),
+            **get_term(item.get('chebi_bqb_is_class'), 'bqb_is_class')
+        }
+        for i, item in enumerate(items or [])
+    ]
+
+def get_parameterisation_records(metadata: dict) -> list[dict]:
+    records = []
+    for parameterisation in metadata.get('parameterisations') or []:
+        for parameter in parameterisation.get('parameters', []):
+            records.append({
+                'position': len(records),
+                'parameterisation_file': parameterisation.get('filename', ''),
+                'model_id': parameterisation.get('model_id', metadata.get('id', '')),
+                'parameter_id': parameter.get('id', ''),
+                'value': parameter.get('value', None),
+                'unit': parameter.get('unit', ''),
+                'reference': parameter.get('reference', ''),
+                **get_term(parameter.get('bqm_is', {}), 'bqm_is'),
+                **get_term(parameter.get('bqb_is', {}), 'bqb_is')
+            })
+    return records
+
+class CatalogIndex:
+    """SQLite index of the metadata of the models in the catalog, with one
+    table per kind of model element. The index is kept in sync with the
+    metadata.yaml files of the models; only models of which the metadata
+    changed are re-indexed."""
+
+    def __init__(self, index_file: str | Path):
+        self.index_file = Path(index_file)
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.index_file)
+        self.connection.row_factory = sqlite3.Row
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self._create_schema()
+
+    def _create_schema(self):
+        with self.connection:
+            tables = self.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            ).fetchall()
+            for (table,) in tables:
+                self.connection.execute(f'DROP TABLE "{table}"')
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_metadata_hashes(self) -> dict[str, str]:
+        rows = self.connection.execute('SELECT key, metadata_hash FROM models').fetchall()
+        return { row['key']: row['metadata_hash'] for row in rows }
+
+    def _insert(self, table: str, model_key: str, records: list[dict]):
+        if not records:
+            return
+        columns = ['model_key'] + list(records[0].keys())
+        self.connection.executemany(
+            f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+            [[model_key] + list(record.values()) for record in records]
+        )
+
+    def _delete(self, key: str):
+        self.connection.execute('DELETE FROM models WHERE key = ?', (key,))
+        for table in MODEL_TABLES:
+            self.connection.execute(f'DELETE FROM {table} WHERE model_key = ?', (key,))
+
+    def update_model(self, key: str, entry: ModelEntry, metadata: dict, metadata_hash: str = None):
+        """Replaces the indexed records of the model by those of its metadata."""
+        with self.connection:
+            self._delete(key)
+            self.connection.execute(
+                'INSERT INTO models VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    key,
+                    entry.filename,
+                    entry.report_path,
+                    entry.route,
+                    entry.chemical_group,
+                    metadata.get('id'),
+                    metadata.get('name'),
+                    metadata.get('num_compartments'),
+                    metadata.get('num_species'),
+                    metadata.get('num_parameters'),
+                    metadata.get('num_reactions'),
+                    metadata_hash
+                )
+            )
+            domain = metadata.get('applicability_domain') or {}
+            for table, items in [('chemicals', domain.get('chemicals')), ('animal_species', domain.get('species'))]:
+                self._insert(table, key, [
+                    { 'position': i, 'id': item.get('id'), 'label': item.get('label'), 'iri': item.get('iri') }
+                    for i, item in enumerate(items or [])
+                ])
+            for table in ['compartments', 'species', 'parameters']:
+                self._insert(table, key, get_element_records(metadata.get(table)))
+            self._insert('parameterisations', key, get_parameterisation_records(metadata))
+            self._insert('unit_checks', key, [
+                { 'position': i, 'level': item.get('level'), 'msg': item.get('msg') }
+                for i, item in enumerate(metadata.get('unit_consistency') or [])
+            ])
+
+    def remove_model(self, key: str):
+        with self.connection:
+            self._delete(key)
+
+    def sync(self, catalog: ModelCatalog) -> tuple[list[str], list[str], list[str], dict[str, str]]:
+        """Updates the index with the metadata files of the catalog. Models of
+        which the metadata file did not change since it was indexed are not
+        re-read. Models of which the metadata cannot be indexed are left out
+        of the index. Returns the keys of the updated and removed models, of
+        the models without metadata file, and the errors of the models that
+        could not be indexed."""
+        indexed = self.get_metadata_hashes()
+        updated = []
+        missing = []
+        failed = {}
+        for entry in catalog:
+            metadata_hash = file_hash(os.path.join(entry.output_dir, 'metadata.yaml'))
+            if metadata_hash is None:
+                missing.append(entry.key)
+                continue
+            if indexed.get(entry.key) == metadata_hash:
+                continue
+            try:
+                self.update_model(entry.key, entry, catalog.get_metadata(entry), metadata_hash)
+                updated.append(entry.key)
+            except Exception as e:
+                failed[entry.key] = str(e)
+        keys = { entry.key for entry in catalog if entry.key not in missing }
+        removed = [key for key in indexed if key not in keys]
+        for key in removed + [key for key in failed if key in indexed]:
+            self.remove_model(key)
+        return updated, removed, missing, failed
+
+    def query(self, sql: str, parameters: tuple | dict = ()) -> list[dict]:
+        return [dict(row) for row in self.connection.execute(sql, parameters)]
+
+    def get_models(self) -> list[dict]:
+        return self.query('SELECT * FROM models ORDER BY key')
+
+    def get_model_summaries(self) -> list[dict]:
+        """Returns the models with the numbers of unannotated elements and of
+        unit consistency errors and warnings."""
+        return self.query(
+            """
+            SELECT m.*,
+                (SELECT COUNT(*) FROM compartments c
+                    WHERE c.model_key = m.key AND c.bqm_is_class_id = '') AS num_compartments_unannotated,
+                (SELECT COUNT(*) FROM species s
+                    WHERE s.model_key = m.key AND s.bqm_is_class_id = '') AS num_species_unannotated,
+                (SELECT COUNT(*) FROM parameters p
+                    WHERE p.model_key = m.key AND p.bqm_is_class_id = '') AS num_parameters_unannotated,
+                (SELECT COUNT(*) FROM unit_checks u
+                    WHERE u.model_key = m.key AND u.level = 'error') AS num_unit_consistency_errors,
+                (SELECT COUNT(*) FROM unit_checks u
+                    WHERE u.model_key = m.key AND u.level = 'warning') AS num_unit_consistency_warnings
+            FROM models m
+            ORDER BY m.key
+            """
+        )
+
+    def get_elements(self, table: str, model_key: str = None) -> list[dict]:
+        """Returns the records of a model element table, joined with the file,
+        route and chemical group of their model."""
+        if table not in MODEL_TABLES:
+            raise ValueError(f"Unknown catalog table [{table}].")
+        where = 'WHERE t.model_key = ?' if model_key else ''
+        return self.query(
+            f"""
+            SELECT m.file, m.route, m.chemical_group, t.*
+            FROM {table} t JOIN models m ON m.key = t.model_key
+            {where}
+            ORDER BY m.key, t.position
+            """,
+            (model_key,) if model_key else ()
+        )
+
+    def find_models_by_chemical(self, chebi_id: str, route: str = None) -> list[dict]:
+        """Returns the models of which the applicability domain or a species
+        is annotated with the ChEBI term, optionally for a route only."""
+        return self.query(
+            """
+            SELECT * FROM models
+            WHERE key IN (
+                SELECT model_key FROM chemicals WHERE id = :id
+                UNION SELECT model_key FROM species WHERE bqb_is_class_id = :id
+            )
+            AND (:route IS NULL OR route = :route)
+            ORDER BY key
+            """,
+            { 'id': chebi_id, 'route': route }
+        )
+
+    def find_parameters_by_term(self, term_id: str) -> list[dict]:
+        """Returns the parameters of all models annotated with the term, e.g.,
+        a PBPKO or ChEBI term id."""
+        return self.query(
+            """
+            SELECT m.key AS model_key, m.file, m.route, m.chemical_group, p.id, p.name, p.unit,
+                p.bqm_is_class_id, p.bqm_is_class_label, p.bqb_is_class_id, p.bqb_is_class_label
+            FROM parameters p JOIN models m ON m.key = p.model_key
+            WHERE p.bqm_is_class_id = :id OR p.bqb_is_class_id = :id
+            ORDER BY m.key, p.position
+            """,
+            { 'id': term_id }
+        )
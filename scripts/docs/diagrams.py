@@ -0,0 +1,131 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import libsbml as ls
+from cache.manifest import hash_object, get_package_versions
+from cache.store import DirectoryCache
+from tracing.trace import span
+
+DIAGRAMS_CACHE_PATH = './.cache/diagrams/'
+
+# Options of the model diagrams in the model reports
+DIAGRAM_OPTIONS = {
+    'names_display': 'ELEMENT_IDS_AND_ONTO_IDS',
+    'draw_species': True,
+    'draw_reaction_ids': True
+}
+
+@dataclass
+class DiagramRequest:
+    # Name of the model, used in logs and traces
+    name: str
+    sbml_file: str
+    diagram_file: str
+    key: str
+    options: dict = field(default_factory=lambda: dict(DIAGRAM_OPTIONS))
+
+@dataclass
+class DiagramResult:
+    request: DiagramRequest
+    success: bool
+    message: str = ''
+    cached: bool = False
+
+def get_element_info(element: ls.SBase) -> dict:
+    return {
+        'id': element.getId(),
+        'name': element.getName(),
+        'annotation': element.getAnnotationString() if element.isSetAnnotation() else None
+    }
+
+def get_model_structure(model: ls.Model) -> dict:
+    """Returns the parts of the model that are drawn in a diagram: the
+    compartments, species and reactions, with their names and annotations
+    (which provide the ontology ids)."""
+    return {
+        'compartments': [get_element_info(c) for c in model.getListOfCompartments()],
+        'species': [
+            { **get_element_info(s), 'compartment': s.getCompartment() }
+            for s in model.getListOfSpecies()
+        ],
+        'reactions': [
+            {
+                **get_element_info(r),
+                'reactants': [x.getSpecies() for x in r.getListOfReactants()],
+                'products': [x.getSpecies() for x in r.getListOfProducts()],
+                'modifiers': [x.getSpecies() for x in r.getListOfModifiers()]
+            }
+            for r in model.getListOfReactions()
+        ]
+    }
+
+def get_diagram_key(document: ls.SBMLDocument, options: dict = DIAGRAM_OPTIONS) -> str:
+    """Returns the cache key of the diagram of a model: a hash of the model
+    structure, the diagram options and the versions of the diagram tools."""
+    return hash_object({
+        'structure': get_model_structure(document.getModel()),
+        'options': options,
+        'versions': get_package_versions('sbmlpbkutils', 'graphviz')
+    })
+
+def render_diagram(sbml_file: str, diagram_file: str | Path, options: dict = DIAGRAM_OPTIONS):
+    from sbmlpbkutils import DiagramCreator, NamesDisplay
+    document = ls.readSBML(str(sbml_file))
+    diagram_creator = DiagramCreator()
+    diagram_creator.create_diagram(
+        document,
+        diagram_file,
+        names_display=NamesDisplay[options['names_display']],
+        draw_species=options['draw_species'],
+        draw_reaction_ids=options['draw_reaction_ids']
+    )
+
+def create_diagram(request: DiagramRequest, force: bool = False) -> DiagramResult:
+    """Copies the diagram of the request from the cache, or renders it in a
+    staging folder and stores it in the cache on a cache miss."""
+    try:
+        cache = DirectoryCache(DIAGRAMS_CACHE_PATH)
+        output_dir = os.path.dirname(request.diagram_file)
+        cached_dir = cache.get(request.key)
+        if cached_dir is not None and not force:
+            shutil.copytree(cached_dir, output_dir, dirs_exist_ok=True)
+            return DiagramResult(request, True, cached=True)
+        # Render in a staging folder to capture all files written by the
+        # diagram creator
+        with tempfile.TemporaryDirectory() as staging_dir, span('diagram', request.name):
+            render_diagram(
+                request.sbml_file,
+                Path(staging_dir) / os.path.basename(request.diagram_file),
+                request.options
+            )
+            cache.put(request.key, staging_dir)
+            shutil.copytree(staging_dir, output_dir, dirs_exist_ok=True)
+    except Exception as e:
+        return DiagramResult(request, False, str(e))
+    return DiagramResult(request, True)
+
+def create_diagrams(requests: list[DiagramRequest], jobs: int = 1, force: bool = False) -> list[DiagramResult]:
+    """Creates the requested diagrams. Diagrams that are not cached are
+    rendered in parallel worker processes if jobs > 1."""
+    cache = DirectoryCache(DIAGRAMS_CACHE_PATH)
+    misses = [i for i, r in enumerate(requests) if force or cache.get(r.key) is None]
+    results = [
+        create_diagram(r) if i not in misses else None
+        for i, r in enumerate(requests)
+    ]
+    if jobs > 1 and len(misses) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            # Executor map yields results in submission order
+            rendered = list(executor.map(
+                create_diagram,
+                [requests[i] for i in misses],
+                [force] * len(misses)
+            ))
+    else:
+        rendered = [create_diagram(requests[i], force) for i in misses]
+    for i, result in zip(misses, rendered):
+        results[i] = result
+    return results
@@ -0,0 +1,75 @@
+import json
+from pathlib import Path
+import libsbml as ls
+from cache.manifest import file_hash
+
+# Version of the sidecar file layout
+UNIT_CHECKS_VERSION = 1
+
+def get_unit_checks_file(sbml_file: str | Path) -> Path:
+    """Returns the sidecar file with the unit consistency check results of
+    an SBML file."""
+    return Path(sbml_file).with_suffix('.units.json')
+
+def check_unit_consistency(doc: ls.SBMLDocument) -> list[dict]:
+    results = []
+    doc.setConsistencyChecks(ls.LIBSBML_CAT_UNITS_CONSISTENCY, True)
+    failures = doc.checkConsistencyWithStrictUnits()
+    if failures > 0:
+        for i in range(failures):
+            error = doc.getError(i)
+            error_code = error.getErrorId()
+            severity = error.getSeverity()
+            if severity in { ls.LIBSBML_SEV_ERROR, ls.LIBSBML_SEV_FATAL} \
+                and error_code != ls.UndeclaredUnits:
+                results.append({
+                    "level": "error",
+                    "msg": doc.getError(i).getMessage().strip()
+                })
+            else:
+                results.append({
+                    "level": "warning",
+                    "msg": doc.getError(i).getMessage().strip()
+                })
+    else:
+        results.append({
+            "level": "info",
+            "msg": "No unit inconsistencies found."
+        })
+    return results
+
+def write_unit_checks(sbml_file: str | Path, results: list[dict]):
+    """Writes the unit consistency check results of the SBML file to its
+    sidecar file, keyed on the hash of the SBML file."""
+    data = {
+        'version': UNIT_CHECKS_VERSION,
+        'sbml_hash': file_hash(sbml_file),
+        'libsbml': ls.getLibSBMLDottedVersion(),
+        'results': results
+    }
+    with open(get_unit_checks_file(sbml_file), 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+
+def read_unit_checks(sbml_file: str | Path) -> list[dict] | None:
+    """Returns the unit consistency check results from the sidecar file of
+    the SBML file, or None if there is no sidecar file or if it was created
+    for another version of the SBML file or of libsbml."""
+    checks_file = get_unit_checks_file(sbml_file)
+    try:
+        with open(checks_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != UNIT_CHECKS_VERSION \
+        or data.get('libsbml') != ls.getLibSBMLDottedVersion() \
+        or data.get('sbml_hash') != file_hash(sbml_file):
+        return None
+    return data.get('results')
+
+def get_unit_checks(sbml_file: str | Path, doc: ls.SBMLDocument) -> list[dict]:
+    """Returns the unit consistency check results of the SBML file computed
+    at compile time, or checks the document if these are not available."""
+    results = read_unit_checks(sbml_file)
+    if results is None:
+        results = check_unit_consistency(doc)
+    return results
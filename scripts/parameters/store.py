@@ -0,0 +1,161 @@
+import os
+import glob
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+import libsbml as ls
+
+# Parameterisation files next to the models, e.g., Model.params.csv or
+# Model.params.PFOS.csv for chemical-specific parameterisations
+PARAMETER_FILE_PATTERNS = ['*.param.csv', '*.params*.csv']
+
+# Columns of the parameter tables
+COLUMNS = ['file', 'row', 'parameter_id', 'raw_value', 'value', 'unit', 'reference']
+
+@dataclass
+class ParameterIssue:
+    file: str
+    parameter_id: str
+    level: str
+    message: str
+
+def find_parameter_files(directory: str) -> list[str]:
+    """Returns the parameterisation files in a folder."""
+    files = set()
+    for pattern in PARAMETER_FILE_PATTERNS:
+        files.update(glob.glob(os.path.join(glob.escape(directory), pattern)))
+    return sorted(files)
+
+def get_column(df: pd.DataFrame, *names: str) -> pd.Series | None:
+    """Returns the first column of the data frame matching one of the names
+    (case-insensitive), or None if there is no such column."""
+    columns = { column.strip().lower(): column for column in df.columns }
+    for name in names:
+        if name in columns:
+            return df[columns[name]]
+    return None
+
+def read_parameter_table(file: str) -> pd.DataFrame:
+    """Reads a parameterisation file into a table with the parameter id, the
+    raw and parsed (float, NaN if missing or invalid) value, unit and
+    reference of each row."""
+    df = pd.read_csv(file, dtype=str, keep_default_na=False)
+    parameter_ids = get_column(df, 'parameter', 'id')
+    raw_values = get_column(df, 'value')
+    if parameter_ids is None or raw_values is None:
+        raise ValueError(f"Parameter file [{file}] has no parameter or value column.")
+    units = get_column(df, 'unit')
+    references = get_column(df, 'reference', 'description')
+    raw_values = raw_values.str.strip()
+    return pd.DataFrame({
+        'file': file,
+        'row': np.arange(len(df)),
+        'parameter_id': parameter_ids.str.strip(),
+        'raw_value': raw_values,
+        'value': pd.to_numeric(raw_values, errors='coerce').astype(float),
+        # Missing unit columns are filled in from the model by the consumers
+        'unit': units.str.strip() if units is not None else None,
+        'reference': references if references is not None else ''
+    }, columns=COLUMNS)
+
+def get_model_element_ids(model: ls.Model) -> set[str]:
+    """Returns the ids of the model elements of which the value can be set
+    by a parameterisation."""
+    return {
+        element.getId()
+        for elements in [
+            model.getListOfParameters(),
+            model.getListOfCompartments(),
+            model.getListOfSpecies()
+        ]
+        for element in elements
+    }
+
+class ParameterStore:
+    """In-memory store of the parameterisation files of the repository. Each
+    file is parsed once into a typed table; docs, simulations and exports
+    all read the values from these tables."""
+
+    def __init__(self):
+        self.tables = {}
+
+    def get_key(self, file: str) -> str:
+        return os.path.normcase(os.path.abspath(file))
+
+    def load(self, files: list[str]) -> dict[str, str]:
+        """Reads the files that are not in the store yet. Returns the errors
+        of files that could not be read, which are not stored."""
+        errors = {}
+        for file in files:
+            key = self.get_key(file)
+            if key in self.tables:
+                continue
+            try:
+                self.tables[key] = read_parameter_table(file)
+            except Exception as e:
+                errors[file] = str(e)
+        return errors
+
+    def load_directory(self, path: str) -> dict[str, str]:
+        """Reads all parameterisation files in the folder and its subfolders."""
+        return self.load([
+            file
+            for pattern in PARAMETER_FILE_PATTERNS
+            for file in glob.glob(os.path.join(glob.escape(path), '**', pattern), recursive=True)
+        ])
+
+    def get_table(self, file: str) -> pd.DataFrame:
+        key = self.get_key(file)
+        if key not in self.tables:
+            self.tables[key] = read_parameter_table(file)
+        return self.tables[key]
+
+    def get_all(self) -> pd.DataFrame:
+        """Returns the tables of all files in the store as one table."""
+        if not self.tables:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.concat(self.tables.values(), ignore_index=True)
+
+    def get_values(self, file: str) -> dict[str, float]:
+        """Returns the parameter values of the file, skipping parameters
+        without (valid) value. Of parameters specified more than once, the
+        first occurrence is used (see validate)."""
+        table = self.get_table(file)
+        table = table.drop_duplicates('parameter_id', keep='first')
+        table = table[table['value'].notna()]
+        return dict(zip(table['parameter_id'], table['value'].tolist()))
+
+    def validate(self, file: str, model: ls.Model) -> list[ParameterIssue]:
+        """Checks the parameterisation file for missing, invalid and duplicate
+        values, and for parameters that do not exist in the model."""
+        table = self.get_table(file)
+        filename = os.path.basename(file)
+        missing = table['raw_value'] == ''
+        invalid = ~missing & table['value'].isna()
+        duplicate = table['parameter_id'].duplicated(keep='first')
+        unknown = ~table['parameter_id'].isin(get_model_element_ids(model))
+        checks = [
+            (missing, 'error', "No value specified for parameter [{id}] in parameterisation file [{file}]."),
+            (invalid, 'error', "Unable to parse numeric value [{value}] for parameter [{id}] in file [{file}]."),
+            (duplicate, 'warning', "Parameter [{id}] is specified more than once in file [{file}]."),
+            (unknown, 'warning', "Parameter [{id}] of file [{file}] does not exist in model [{model}].")
+        ]
+        issues = []
+        for mask, level, message in checks:
+            for parameter_id, raw_value in zip(table.loc[mask, 'parameter_id'], table.loc[mask, 'raw_value']):
+                issues.append(ParameterIssue(
+                    file,
+                    parameter_id,
+                    level,
+                    message.format(id=parameter_id, value=raw_value, file=filename, model=model.getId())
+                ))
+        return issues
+
+_default_store = None
+
+def get_parameter_store() -> ParameterStore:
+    """Returns the parameter store shared within the process."""
+    global _default_store
+    if _default_store is None:
+        _default_store = ParameterStore()
+    return _default_store
@@ -0,0 +1,187 @@
+import sys
+import argparse
+import importlib
+
+# Subcommands: module implementing the command and its description. Modules
+# are imported only when their command runs, so that the simulation stack is
+# not loaded for commands (or help messages) that do not need it.
+COMMANDS = {
+    'compile': ('compile_models', 'Compile Antimony models to annotated SBML.'),
+    'docs': ('create_model_docs', 'Create model documentation pages.'),
+    'simulate': ('run_simulations', 'Run simulation scenarios and create simulation reports.'),
+    'serve': ('serve', 'Run a local simulation service with preloaded models.'),
+    'calibrate': ('calibrate', 'Calibrate model parameters against observed data.'),
+    'benchmark': ('benchmark', 'Benchmark compiling, loading and simulating the models and scenarios.')
+}
+
+# Default relative slowdown and minimal absolute slowdown (seconds) for which
+# a benchmark timing is flagged as a regression
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MIN_DELTA = 0.05
+
+def add_trace_argument(parser: argparse.ArgumentParser, stages: str):
+    parser.add_argument(
+        '--trace',
+        metavar='FILE',
+        help=f'write timings of the {stages} to this Chrome trace file'
+    )
+
+def add_strict_argument(parser: argparse.ArgumentParser, items: str):
+    parser.add_argument(
+        '--strict',
+        action='store_true',
+        help=f'exit with a non-zero status if any of the {items} failed'
+    )
+
+def add_compile_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        'models',
+        nargs='*',
+        help='Antimony model files to compile (default: all models)'
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='number of worker processes used to compile models concurrently (default: 1)'
+    )
+    parser.add_argument(
+        '-f', '--force',
+        action='store_true',
+        help='recompile all models, ignoring the build manifest'
+    )
+    add_strict_argument(parser, 'models')
+    add_trace_argument(parser, 'compile stages of each model')
+
+def add_docs_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='number of worker processes used to render model diagrams concurrently (default: 1)'
+    )
+    parser.add_argument(
+        '-f', '--force',
+        action='store_true',
+        help='regenerate the pages of all models, ignoring the docs manifest'
+    )
+    add_strict_argument(parser, 'model diagrams')
+    add_trace_argument(parser, 'documentation stages of each model')
+
+def add_simulate_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='number of worker processes used to run scenarios concurrently (default: 1)'
+    )
+    parser.add_argument(
+        '-f', '--force',
+        action='store_true',
+        help='re-simulate all scenarios, ignoring cached results'
+    )
+    add_trace_argument(parser, 'simulation stages of each scenario')
+
+def add_serve_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        'configs',
+        nargs='*',
+        help='simulation configs of which the models are preloaded (default: all configs in scenarios/)'
+    )
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='address to listen on (default: %(default)s)'
+    )
+    parser.add_argument(
+        '-p', '--port',
+        type=int,
+        default=8765,
+        help='port to listen on (default: %(default)s)'
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='number of worker processes simulating requests concurrently (default: 1)'
+    )
+
+def add_calibrate_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        'specs',
+        nargs='*',
+        help='calibration spec files (default: all specs in calibrations/)'
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='number of worker processes used to simulate candidate parameter sets concurrently (default: 1)'
+    )
+    add_trace_argument(parser, 'calibration stages')
+
+def add_benchmark_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        '-o', '--output',
+        help='write the benchmark results (JSON) to this file'
+    )
+    parser.add_argument(
+        '-b', '--baseline',
+        help='compare with the benchmark results (JSON) in this file and exit with status 1 on regressions'
+    )
+    parser.add_argument(
+        '-r', '--repeat',
+        type=int,
+        default=1,
+        help='number of repetitions of which the fastest is reported (default: 1)'
+    )
+    parser.add_argument(
+        '-m', '--models',
+        help='only benchmark models of which the path contains this text'
+    )
+    parser.add_argument(
+        '--no-simulate',
+        action='store_true',
+        help='skip the scenario simulations'
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help='relative slowdown flagged as regression (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--min-delta',
+        type=float,
+        default=DEFAULT_MIN_DELTA,
+        help='minimal slowdown in seconds flagged as regression (default: %(default)s)'
+    )
+
+ARGUMENTS = {
+    'compile': add_compile_arguments,
+    'docs': add_docs_arguments,
+    'simulate': add_simulate_arguments,
+    'serve': add_serve_arguments,
+    'calibrate': add_calibrate_arguments,
+    'benchmark': add_benchmark_arguments
+}
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='pbk',
+        description='Compile, document, simulate, serve, calibrate and benchmark the PBK models of this repository.'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True, metavar='command')
+    for command, (module, description) in COMMANDS.items():
+        subparser = subparsers.add_parser(command, help=description, description=description)
+        ARGUMENTS[command](subparser)
+        subparser.set_defaults(module=module)
+    return parser
+
+def main(argv: list[str] = None) -> int:
+    args = create_parser().parse_args(argv)
+    module = importlib.import_module(args.module)
+    return module.run(args) or 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,37 @@
+import sys
+import enum
 import glob
 import os
+import shutil
+import tempfile
 import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+import numpy as np
 from docs.utils import render_template
-from sbmlpbkutils import load_config, run_config, plot_simulation_results
+from sbmlpbkutils import load_config
+from cache.manifest import file_hash, hash_object, get_package_versions
+from cache.store import DirectoryCache
+from parameters.store import get_parameter_store
+from simulation.config import load_scenario_extensions
+from simulation.engine import get_simulator, get_steady_state_options, get_solver
+from simulation.recording import get_recording_options
+from simulation.results import write_scenario_results, plot_scenario_results, ScenarioResults
+from tracing.trace import span, enable_tracing, finish_tracing
+from pbk import add_simulate_arguments
+from simulation.population import load_population_specs, run_population_simulation, \
+    write_population_results, plot_population_results
+from simulation.sensitivity import load_sensitivity_specs, run_sensitivity_analysis, \
+    write_sensitivity_results, get_top_sensitivities
 
 CONFIGS_PATH = './scenarios/'
 OUTPUT_PATH = 'docs/simulation'
+RESULTS_CACHE_PATH = './.cache/simulations/'
+# Modules of the simulation package that affect the simulated results; the
+# population and sensitivity modules only affect their own analyses
+ENGINE_MODULES = ['engine', 'linear', 'recording', 'units', 'results']
 
 # Configure logger for formatted console output
 console_logger = logging.getLogger('create_simulation_reports')
@@ -16,42 +42,359 @@ _console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
 if not console_logger.handlers:
     console_logger.addHandler(_console_handler)
 
-def create_simulation_reports(force_recompute: bool):
-    configs = glob.glob(f'./{CONFIGS_PATH}/**/*.yaml', recursive=True)
-    for file in configs:
-        file_dir = os.path.dirname(file)
+@dataclass
+class SimulationUnit:
+    config_file: str
+    scenario_id: str
+    out_path: str
+    population: dict = None
+    sensitivity: dict = None
 
-        # Load config
-        config = load_config(file)
+    @property
+    def name(self) -> str:
+        if self.population:
+            return f"{self.scenario_id} (population)"
+        if self.sensitivity is not None:
+            return f"{self.scenario_id} (sensitivity)"
+        return self.scenario_id
 
-        # Create output directory if it does not exist
-        out_path = os.path.join(OUTPUT_PATH, os.path.relpath(file_dir, CONFIGS_PATH))
+@dataclass
+class SimulationResult:
+    unit: SimulationUnit
+    success: bool
+    message: str = ''
+    cache_key: str = None
+    cached: bool = False
 
-        # Ensure output path
-        os.makedirs(out_path, exist_ok=True)
+def get_out_path(config_file: str) -> str:
+    file_dir = os.path.dirname(config_file)
+    return os.path.join(OUTPUT_PATH, os.path.relpath(file_dir, CONFIGS_PATH))
+
+def create_simulation_reports(force_recompute: bool = False, jobs: int = 1) -> list[SimulationResult]:
+    configs = sorted(glob.glob(f'./{CONFIGS_PATH}/**/*.yaml', recursive=True))
 
-        # Run simulations
-        console_logger.info(f"Running simulation config {file}")
-        run_config(
-            config = config,
-            out_path = out_path,
-            logger = console_logger,
-            force_recompute = force_recompute
+    # Split configs into independent (config, scenario) simulation units
+    units = []
+    analysis_units = []
+    param_files = set()
+    for file in configs:
+        config = load_config(file)
+        param_files.update(
+            m.param_file for m in config.model_instances if getattr(m, 'param_file', None)
         )
+        out_path = get_out_path(file)
+        os.makedirs(out_path, exist_ok=True)
+        population_specs = load_population_specs(file)
+        sensitivity_specs = load_sensitivity_specs(file)
+        for scenario in config.scenarios:
+            units.append(SimulationUnit(file, scenario.id, out_path))
+            if scenario.id in population_specs:
+                analysis_units.append(
+                    SimulationUnit(file, scenario.id, out_path, population=population_specs[scenario.id])
+                )
+            if scenario.id in sensitivity_specs:
+                analysis_units.append(
+                    SimulationUnit(file, scenario.id, out_path, sensitivity=sensitivity_specs[scenario.id])
+                )
+
+    # Parse the parameterisation files once, before the worker processes are
+    # forked, so that all simulations read their values from the same
+    # parameter store; errors are reported when the model instances are
+    # loaded
+    with span('load_parameters'):
+        get_parameter_store().load(sorted(param_files))
+
+    # Run simulations
+    results = run_parallel(
+        partial(run_simulation_unit, force_recompute=force_recompute),
+        units,
+        jobs=jobs
+    )
+
+    # Run population simulations and sensitivity analyses; these distribute
+    # their simulations over the worker processes themselves
+    results += [
+        run_simulation_unit(unit, force_recompute=force_recompute, jobs=jobs)
+        for unit in analysis_units
+    ]
+    log_simulation_summary(results)
+
+    # Drop cached results of scenarios that are no longer simulated
+    results_cache = DirectoryCache(RESULTS_CACHE_PATH)
+    results_cache.prune({ r.cache_key for r in results if r.cache_key })
+
+    # Plot simulation results and render reports of configs for which all
+    # scenarios were simulated successfully
+    failed_configs = { r.unit.config_file for r in results if not r.success }
+    for file in failed_configs:
+        console_logger.error("Skipping report of config %s: not all scenarios succeeded.", file)
+    report_configs = [file for file in configs if file not in failed_configs]
+    run_parallel(create_simulation_report, report_configs, jobs=jobs)
+    return results
+
+def run_parallel(func, items: list, jobs: int = 1) -> list:
+    if jobs > 1 and len(items) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            # Executor map yields results in submission order
+            return list(executor.map(func, items))
+    return [func(item) for item in items]
 
-        # Plot simulation results
-        plot_simulation_results(
-            config = config,
-            out_path = out_path
+def to_normalized_dict(obj, exclude: set[str] = frozenset({'label'})):
+    """Converts (nested) config objects to plain JSON-serialisable values,
+    leaving out descriptive fields that do not affect simulation results."""
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, dict):
+        return {
+            str(key): to_normalized_dict(value, exclude)
+            for key, value in obj.items()
+            if key not in exclude
+        }
+    if isinstance(obj, (list, tuple)):
+        return [to_normalized_dict(value, exclude) for value in obj]
+    if hasattr(obj, 'model_dump'):
+        return to_normalized_dict(obj.model_dump(), exclude)
+    if hasattr(obj, '__dict__'):
+        return to_normalized_dict(vars(obj), exclude)
+    return obj
+
+def get_engine_hash(modules: list[str] = ENGINE_MODULES) -> dict[str, str]:
+    """Returns the hashes of the source files of the given modules of the
+    simulation package (by default, those of the dosing engine)."""
+    engine_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'simulation')
+    return {
+        f"{module}.py": file_hash(os.path.join(engine_path, f"{module}.py"))
+        for module in modules
+    }
+
+def get_cache_key(config, scenario) -> str:
+    model_instances = []
+    for model_instance in config.model_instances:
+        model_instances.append({
+            'id': model_instance.id,
+            'model': file_hash(model_instance.model_path),
+            'param_file': file_hash(model_instance.param_file) \
+                if getattr(model_instance, 'param_file', None) else None,
+            'target_mappings': to_normalized_dict(model_instance.target_mappings)
+        })
+    return hash_object({
+        'config_id': config.id,
+        'model_instances': model_instances,
+        'scenario': to_normalized_dict(scenario),
+        'versions': get_package_versions('libroadrunner', 'numpy', 'scipy'),
+        'engine': get_engine_hash()
+    })
+
+def run_simulation_unit(
+    unit: SimulationUnit,
+    force_recompute: bool,
+    jobs: int = 1
+) -> SimulationResult:
+    try:
+        config = load_config(unit.config_file)
+
+        # Results are stored per scenario, so units of the same config write
+        # to distinct files
+        scenario = next(s for s in config.scenarios if s.id == unit.scenario_id)
+
+        # Copy results from cache if model, parameterisation and scenario did
+        # not change since the last run; population, solver and steady state
+        # settings extend the config schema
+        results_cache = DirectoryCache(RESULTS_CACHE_PATH)
+        extensions = load_scenario_extensions(unit.config_file)[unit.scenario_id]
+        cache_key = hash_object({
+            'scenario': get_cache_key(config, scenario),
+            'extensions': extensions,
+            'population': bool(unit.population),
+            'sensitivity': unit.sensitivity is not None,
+            'analysis': get_engine_hash(
+                ['population'] if unit.population
+                    else ['sensitivity'] if unit.sensitivity is not None
+                    else []
+            )
+        })
+        item = f"{unit.config_file}:{unit.name}"
+        cached_dir = results_cache.get(cache_key)
+        if cached_dir is not None and not force_recompute:
+            console_logger.info(
+                f"Using cached results for scenario {unit.name} of simulation config {unit.config_file}"
+            )
+            with span('restore_cached', item):
+                shutil.copytree(cached_dir, unit.out_path, dirs_exist_ok=True)
+            return SimulationResult(unit, True, cache_key=cache_key, cached=True)
+
+        # Simulate in a staging folder to capture the result files of this
+        # scenario, then store them in the cache and the output folder
+        console_logger.info(f"Running scenario {unit.name} of simulation config {unit.config_file}")
+        with tempfile.TemporaryDirectory() as staging_dir:
+            if unit.population:
+                with span('simulate_population', item):
+                    population_results = run_population_simulation(
+                        unit.config_file,
+                        unit.scenario_id,
+                        unit.population,
+                        jobs=jobs
+                    )
+                for result in population_results:
+                    reached = result.steady_state_times[~np.isnan(result.steady_state_times)]
+                    if len(reached):
+                        console_logger.info(
+                            "Scenario [%s], model instance [%s]: periodic steady state in %d of %d individuals, at t=%g-%g %s.",
+                            scenario.id,
+                            result.model_instance_id,
+                            len(reached),
+                            result.size,
+                            np.min(reached),
+                            np.max(reached),
+                            scenario.time_unit.value
+                        )
+                with span('write', item):
+                    write_population_results(
+                        population_results,
+                        os.path.join(staging_dir, f"{scenario.id}_population.csv")
+                    )
+            elif unit.sensitivity is not None:
+                with span('sensitivity', item):
+                    sensitivity_results = run_sensitivity_analysis(
+                        unit.config_file,
+                        unit.scenario_id,
+                        unit.sensitivity,
+                        jobs=jobs
+                    )
+                with span('write', item):
+                    write_sensitivity_results(
+                        sensitivity_results,
+                        os.path.join(staging_dir, f"{scenario.id}_sensitivity.csv")
+                    )
+            else:
+                results = []
+                for model_instance in config.model_instances:
+                    # Model instances are loaded once per config in each
+                    # (worker) process and reused for its other scenarios
+                    with span('load', item, model_instance=model_instance.id):
+                        _, simulator = get_simulator(unit.config_file, model_instance.id, console_logger)
+                    with span('simulate', item, model_instance=model_instance.id):
+                        result = simulator.simulate(
+                            scenario,
+                            steady_state=get_steady_state_options(extensions),
+                            solver=get_solver(extensions),
+                            recording=get_recording_options(extensions)
+                        )
+                    result.model_instance_id = model_instance.id
+                    if result.steady_state_time is not None:
+                        console_logger.info(
+                            "Scenario [%s], model instance [%s]: periodic steady state at t=%g %s.",
+                            scenario.id,
+                            model_instance.id,
+                            result.steady_state_time,
+                            scenario.time_unit.value
+                        )
+                    results.append(result)
+                with span('write', item):
+                    write_scenario_results(scenario, results, staging_dir)
+            with span('store_cached', item):
+                results_cache.put(cache_key, staging_dir)
+                shutil.copytree(staging_dir, unit.out_path, dirs_exist_ok=True)
+    except Exception as e:
+        console_logger.error(
+            "Error running scenario [%s] of config [%s]: %s",
+            unit.name,
+            unit.config_file,
+            str(e)
         )
+        return SimulationResult(unit, False, str(e))
+    return SimulationResult(unit, True, cache_key=cache_key)
+
+def log_simulation_summary(results: list[SimulationResult]):
+    num_failed = len([r for r in results if not r.success])
+    num_cached = len([r for r in results if r.cached])
+    console_logger.info(
+        "Processed %d scenarios: %d simulated, %d from cache, %d failed.",
+        len(results),
+        len(results) - num_failed - num_cached,
+        num_cached,
+        num_failed
+    )
+    for result in results:
+        if result.cached:
+            console_logger.info("  [CACHED] %s: %s", result.unit.config_file, result.unit.name)
+        elif result.success:
+            console_logger.info("  [OK]     %s: %s", result.unit.config_file, result.unit.name)
+        else:
+            console_logger.error(
+                "  [FAILED] %s: %s: %s",
+                result.unit.config_file,
+                result.unit.name,
+                result.message
+            )
 
-        # Rendering report
-        console_logger.info(f"Rendering scenario report for config {config.id}.")
+def create_simulation_report(file: str):
+    config = load_config(file)
+    out_path = get_out_path(file)
+
+    # Plot simulation results
+    population_specs = load_population_specs(file)
+    for scenario in config.scenarios:
+        with span('plot', file, scenario=scenario.id):
+            plot_scenario_results(config, scenario, out_path)
+        if scenario.id in population_specs:
+            with span('plot_population', file, scenario=scenario.id):
+                plot_population_results(
+                    config,
+                    scenario,
+                    os.path.join(out_path, f"{scenario.id}_population.csv"),
+                    out_path
+                )
+
+    # Summary metrics of scenarios recorded with reduced resolution and
+    # periodic steady state detection times
+    summaries = {}
+    steady_state_times = {}
+    for scenario in config.scenarios:
+        results = ScenarioResults(out_path, scenario.id)
+        if results.header.get('steady_state_times'):
+            steady_state_times[scenario.id] = results.header['steady_state_times']
+        records = results.get_summary_records()
+        if records:
+            summaries[scenario.id] = {
+                'summary_only': results.header['num_times'] == 0,
+                'outputs': records
+            }
+
+    # Most influential parameters of the sensitivity analyses
+    sensitivities = {
+        scenario_id: get_top_sensitivities(os.path.join(out_path, f"{scenario_id}_sensitivity.csv"))
+        for scenario_id in load_sensitivity_specs(file)
+    }
+
+    # Rendering report
+    console_logger.info(f"Rendering scenario report for config {config.id}.")
+    with span('render', file):
         render_template(
             name="simulation_report",
             output_file=os.path.join(out_path, f"{config.id}.md"),
-            config=config
+            config=config,
+            populations=population_specs,
+            summaries=summaries,
+            steady_state_times=steady_state_times,
+            sensitivities=sensitivities
         )
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run simulation scenarios and create simulation reports.')
+    add_simulate_arguments(parser)
+    return parser.parse_args()
+
+def run(args) -> int:
+    if args.trace:
+        enable_tracing()
+    try:
+        results = create_simulation_reports(force_recompute=args.force, jobs=max(1, args.jobs))
+    finally:
+        if args.trace:
+            finish_tracing(args.trace, console_logger)
+    # Fail (e.g., the docs build) if any scenario failed
+    return 1 if any(not r.success for r in results) else 0
+
 if __name__ == '__main__':
-    create_simulation_reports(True)
+    sys.exit(run(parse_args()))
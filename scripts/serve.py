@@ -0,0 +1,41 @@
+import sys
+import glob
+import logging
+import argparse
+from simulation.service import SimulationService
+from pbk import add_serve_arguments
+
+CONFIGS_PATH = './scenarios/'
+
+# Configure logger for formatted console output
+console_logger = logging.getLogger('serve')
+console_logger.setLevel(logging.INFO)
+_console_handler = logging.StreamHandler()
+_console_handler.setLevel(logging.INFO)
+_console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+if not console_logger.handlers:
+    console_logger.addHandler(_console_handler)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run a local simulation service with preloaded models.')
+    add_serve_arguments(parser)
+    return parser.parse_args()
+
+def run(args):
+    config_files = args.configs or sorted(glob.glob(f'{CONFIGS_PATH}**/*.yaml', recursive=True))
+    jobs = max(1, args.jobs)
+    console_logger.info(f"Preloading the models of {len(config_files)} simulation configs in {jobs} worker processes.")
+    service = SimulationService((args.host, args.port), config_files, jobs=jobs, logger=console_logger)
+    console_logger.info(
+        f"Simulation service with {service.num_models} models listening on http://{args.host}:{service.server_port}."
+    )
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.server_close()
+        console_logger.info("Simulation service stopped.")
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
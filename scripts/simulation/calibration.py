@@ -0,0 +1,286 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+import yaml
+from sbmlpbkutils import load_config
+from simulation.config import load_scenario_extensions
+from simulation.engine import get_simulator, get_steady_state_options, get_solver
+
+DEFAULT_MAX_ITERATIONS = 100
+DEFAULT_POPULATION_SIZE = 15
+DEFAULT_BATCH_SIZE = 10
+OBJECTIVES = ['log', 'linear']
+
+@dataclass
+class Observation:
+    output_id: str
+    # Observation times in scenario time units and observed values in the
+    # units of the output
+    time: np.ndarray
+    values: np.ndarray
+    weight: float = 1.
+
+@dataclass
+class CalibrationParameter:
+    id: str
+    min: float
+    max: float
+    # Search on a log scale (for strictly positive bounds)
+    log: bool
+    initial: float = None
+
+@dataclass
+class CalibrationResult:
+    spec_file: str
+    label: str
+    parameter_ids: list[str]
+    initial_values: np.ndarray
+    values: np.ndarray
+    initial_objective: float
+    objective: float
+    num_evaluations: int
+
+def load_calibration_spec(spec_file: str) -> dict:
+    with open(spec_file, 'r', encoding='utf-8') as f:
+        spec = yaml.safe_load(f) or {}
+    for key in ['config', 'model_instance', 'scenario', 'parameters', 'observations']:
+        if not spec.get(key):
+            raise ValueError(f"Calibration spec [{spec_file}] has no [{key}].")
+    return spec
+
+def load_observations(spec: dict, spec_file: str) -> list[Observation]:
+    """Returns the observations of the spec, given inline (time and value
+    lists) or as a CSV file with time and value columns, relative to the
+    spec file."""
+    observations = []
+    for definition in spec['observations']:
+        if 'file' in definition:
+            df = pd.read_csv(os.path.join(os.path.dirname(spec_file), definition['file']))
+            time, values = df['time'], df['value']
+        else:
+            time, values = definition['time'], definition['value']
+        observations.append(Observation(
+            output_id=definition['output'],
+            time=np.asarray(time, dtype=float),
+            values=np.asarray(values, dtype=float),
+            weight=float(definition.get('weight', 1.))
+        ))
+    return observations
+
+def get_calibration_parameters(spec: dict, initial_values: dict[str, float]) -> list[CalibrationParameter]:
+    parameters = []
+    for parameter_id, definition in spec['parameters'].items():
+        lower, upper = float(definition['min']), float(definition['max'])
+        if not lower < upper:
+            raise ValueError(f"Invalid bounds [{lower}, {upper}] for parameter [{parameter_id}].")
+        parameters.append(CalibrationParameter(
+            id=parameter_id,
+            min=lower,
+            max=upper,
+            log=bool(definition.get('log', lower > 0)),
+            initial=initial_values.get(parameter_id)
+        ))
+    return parameters
+
+def to_search_space(parameters: list[CalibrationParameter], values: np.ndarray) -> np.ndarray:
+    log = np.array([p.log for p in parameters])
+    values = np.asarray(values, dtype=float)
+    return np.where(log[:, None] if values.ndim > 1 else log, np.log10(np.abs(values) + (values == 0)), values)
+
+def from_search_space(parameters: list[CalibrationParameter], x: np.ndarray) -> np.ndarray:
+    log = np.array([p.log for p in parameters])
+    return np.where(log[:, None] if x.ndim > 1 else log, 10. ** x, x)
+
+def get_objective(
+    output_index: dict[str, int],
+    time: np.ndarray,
+    values: np.ndarray,
+    observations: list[Observation],
+    objective: str
+) -> np.ndarray:
+    """Returns the weighted mean squared error of the simulated outputs
+    (samples x times x outputs), interpolated at the observation times, for
+    each sample. The log objective compares the logarithms of the values,
+    ignoring non-positive observations."""
+    total = np.zeros(values.shape[0])
+    for observation in observations:
+        j = output_index[observation.output_id]
+        simulated = np.stack([np.interp(observation.time, time, v[:, j]) for v in values])
+        observed = observation.values
+        if objective == 'log':
+            mask = observed > 0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                residuals = np.log(np.maximum(simulated[:, mask], 1e-300)) - np.log(observed[mask])
+        else:
+            residuals = simulated - observed
+        total += observation.weight * np.mean(residuals ** 2, axis=1)
+    return np.where(np.isfinite(total), total, np.inf)
+
+def evaluate_candidates(
+    config_file: str,
+    model_instance_id: str,
+    scenario_id: str,
+    parameter_ids: list[str],
+    samples: np.ndarray,
+    observations: list[Observation],
+    objective: str
+) -> np.ndarray:
+    """Simulates a batch of candidate parameter sets with the loaded simulator
+    of this process and returns their objective values. Failed simulations
+    get an infinite objective."""
+    config, simulator = get_simulator(config_file, model_instance_id)
+    scenario = next(s for s in config.scenarios if s.id == scenario_id)
+    extensions = load_scenario_extensions(config_file).get(scenario_id, {})
+    steady_state = get_steady_state_options(extensions)
+    solver = get_solver(extensions)
+    output_index = { output.id: j for j, output in enumerate(scenario.outputs) }
+    objectives = np.empty(len(samples))
+    for i, row in enumerate(samples):
+        try:
+            result = simulator.simulate(scenario, dict(zip(parameter_ids, row)), steady_state, solver)
+            objectives[i] = get_objective(output_index, result.time, result.values[None], observations, objective)[0]
+        except Exception:
+            objectives[i] = np.inf
+    return objectives
+
+def run_calibration(spec_file: str, jobs: int = 1) -> CalibrationResult:
+    """Fits the parameters of a model instance to observed time series with
+    differential evolution, starting from the parameterisation values. Each
+    generation of candidate parameter sets is evaluated in batches, across
+    worker processes if jobs > 1, each of which loads the model once."""
+    from scipy.optimize import differential_evolution
+
+    spec = load_calibration_spec(spec_file)
+    config_file = spec['config']
+    config = load_config(config_file)
+    model_instance_id = spec['model_instance']
+    scenario_id = spec['scenario']
+    scenario = next((s for s in config.scenarios if s.id == scenario_id), None)
+    if scenario is None:
+        raise ValueError(f"Scenario [{scenario_id}] not found in config [{config_file}].")
+    observations = load_observations(spec, spec_file)
+    output_ids = { output.id for output in scenario.outputs }
+    for observation in observations:
+        if observation.output_id not in output_ids:
+            raise ValueError(f"Output [{observation.output_id}] not found in scenario [{scenario_id}].")
+    objective = str(spec.get('objective', 'log')).lower()
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective [{objective}], expected one of {OBJECTIVES}.")
+    options = spec.get('options') or {}
+    batch_size = int(options.get('batch_size', DEFAULT_BATCH_SIZE))
+
+    # Warm start from the parameterisation, clipped to the bounds
+    _, simulator = get_simulator(config_file, model_instance_id)
+    parameters = get_calibration_parameters(spec, {
+        parameter_id: simulator.get_parameter_value(parameter_id)
+        for parameter_id in spec['parameters']
+    })
+    parameter_ids = [p.id for p in parameters]
+    initial_values = np.clip(
+        [p.initial for p in parameters],
+        [p.min for p in parameters],
+        [p.max for p in parameters]
+    )
+    bounds = list(zip(
+        to_search_space(parameters, [p.min for p in parameters]),
+        to_search_space(parameters, [p.max for p in parameters])
+    ))
+
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    num_evaluations = 0
+
+    def evaluate(samples: np.ndarray) -> np.ndarray:
+        nonlocal num_evaluations
+        num_evaluations += len(samples)
+        batches = [samples[i:i + batch_size] for i in range(0, len(samples), batch_size)]
+        args = (config_file, model_instance_id, scenario_id, parameter_ids)
+        if executor is not None:
+            results = executor.map(
+                evaluate_candidates,
+                *zip(*[args + (b, observations, objective) for b in batches])
+            )
+        else:
+            results = (evaluate_candidates(*args, b, observations, objective) for b in batches)
+        return np.concatenate(list(results))
+
+    def func(x: np.ndarray) -> np.ndarray:
+        # Candidates as columns (vectorized), or a single candidate
+        if x.ndim == 1:
+            return evaluate(from_search_space(parameters, x)[None, :])[0]
+        return evaluate(from_search_space(parameters, x).T)
+
+    try:
+        initial_objective = float(evaluate(initial_values[None, :])[0])
+        result = differential_evolution(
+            func,
+            bounds,
+            x0=to_search_space(parameters, initial_values),
+            maxiter=int(options.get('max_iterations', DEFAULT_MAX_ITERATIONS)),
+            popsize=int(options.get('population_size', DEFAULT_POPULATION_SIZE)),
+            tol=float(options.get('tol', 0.01)),
+            seed=options.get('seed'),
+            polish=bool(options.get('polish', False)),
+            vectorized=True,
+            updating='deferred'
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if not np.isfinite(result.fun):
+        raise ValueError(
+            f"No simulation of scenario [{scenario_id}] succeeded for the parameter bounds "
+            f"({num_evaluations} simulations), no calibrated values found."
+        )
+    values = from_search_space(parameters, result.x)
+    objective_value = float(result.fun)
+    if objective_value > initial_objective:
+        # Keep the parameterisation if no better parameter set was found
+        values, objective_value = initial_values, initial_objective
+    return CalibrationResult(
+        spec_file=spec_file,
+        label=str(spec.get('label') or spec.get('id') or os.path.splitext(os.path.basename(spec_file))[0]),
+        parameter_ids=parameter_ids,
+        initial_values=initial_values,
+        values=values,
+        initial_objective=initial_objective,
+        objective=objective_value,
+        num_evaluations=num_evaluations
+    )
+
+def get_calibrated_param_file(param_file: str, label: str) -> str:
+    """Returns the parameterisation file for the calibrated values, e.g.,
+    Model.params.<label>.csv for Model.params.csv."""
+    name = os.path.basename(param_file)
+    base = name.split('.params', 1)[0] if '.params' in name else os.path.splitext(name)[0]
+    return os.path.join(os.path.dirname(param_file), f"{base}.params.{label}.csv")
+
+def write_calibrated_param_file(param_file: str, result: CalibrationResult) -> str:
+    """Writes a copy of the parameterisation file with the calibrated values.
+    Returns the written file."""
+    df = pd.read_csv(param_file, dtype=str, keep_default_na=False)
+    columns = { column.strip().lower(): column for column in df.columns }
+    parameter_column = columns.get('parameter') or columns.get('id')
+    value_column = columns.get('value')
+    reference_column = columns.get('reference')
+    values = { p: f"{v:.6g}" for p, v in zip(result.parameter_ids, result.values) }
+    calibrated = df[parameter_column].str.strip().isin(values)
+    df.loc[calibrated, value_column] = df.loc[calibrated, parameter_column].str.strip().map(values)
+    if reference_column:
+        df.loc[calibrated, reference_column] = f"Calibrated ({os.path.basename(result.spec_file)})"
+
+    # Calibrated parameters that are not in the parameterisation file yet
+    missing = [p for p in result.parameter_ids if p not in set(df[parameter_column].str.strip())]
+    if missing:
+        rows = pd.DataFrame('', index=range(len(missing)), columns=df.columns)
+        rows[parameter_column] = missing
+        rows[value_column] = [values[p] for p in missing]
+        if reference_column:
+            rows[reference_column] = f"Calibrated ({os.path.basename(result.spec_file)})"
+        df = pd.concat([df, rows], ignore_index=True)
+
+    out_file = get_calibrated_param_file(param_file, result.label)
+    df.to_csv(out_file, index=False)
+    return out_file
@@ -0,0 +1,79 @@
+import io
+import json
+import zipfile
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+import numpy as np
+import yaml
+from simulation.results import ScenarioResults
+
+DEFAULT_URL = 'http://127.0.0.1:8765'
+
+class SimulationServiceError(Exception):
+    pass
+
+class SimulationClient:
+    """Client of the local simulation service (see serve.py)."""
+
+    def __init__(self, url: str = DEFAULT_URL, timeout: float = None):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        # Server timings (ms) of the last request, per stage
+        self.timings = {}
+
+    def simulate(self, config: str | dict, scenario_ids: list[str] = None) -> dict[str, ScenarioResults]:
+        """Simulates the scenarios of a simulation config, given as a dict or
+        as YAML or JSON text. Returns the results per scenario id."""
+        config_text = config if isinstance(config, str) else yaml.safe_dump(config)
+        query = f"?{urlencode({ 'scenario': scenario_ids }, doseq=True)}" if scenario_ids else ''
+        request = urllib.request.Request(
+            f"{self.url}/simulate{query}",
+            data=config_text.encode('utf-8'),
+            headers={ 'Content-Type': 'application/yaml' },
+            method='POST'
+        )
+        body, headers = self._send(request)
+        self.timings = {
+            stage: float(duration)
+            for stage, _, duration in (
+                item.strip().partition(';dur=') for item in headers.get('Server-Timing', '').split(',') if item.strip()
+            )
+        }
+        return decode_results(body)
+
+    def simulate_file(self, config_file: str, scenario_ids: list[str] = None) -> dict[str, ScenarioResults]:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return self.simulate(f.read(), scenario_ids)
+
+    def get_metrics(self) -> dict:
+        body, _ = self._send(urllib.request.Request(f"{self.url}/metrics"))
+        return json.loads(body)
+
+    def get_health(self) -> dict:
+        body, _ = self._send(urllib.request.Request(f"{self.url}/health"))
+        return json.loads(body)
+
+    def _send(self, request: urllib.request.Request) -> tuple[bytes, dict]:
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read(), dict(response.headers)
+        except urllib.error.HTTPError as error:
+            try:
+                message = json.loads(error.read()).get('error', error.reason)
+            except ValueError:
+                message = error.reason
+            raise SimulationServiceError(message) from None
+
+def decode_results(body: bytes) -> dict[str, ScenarioResults]:
+    """Decodes the results of the scenarios returned by the simulation
+    service."""
+    results = {}
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        for name in archive.namelist():
+            if not name.endswith('.results.json'):
+                continue
+            header = json.loads(archive.read(name))
+            data = np.load(io.BytesIO(archive.read(header['data_file'])))
+            results[header['scenario']] = ScenarioResults.from_data(header, data)
+    return results
@@ -0,0 +1,13 @@
+import yaml
+
+def load_scenario_extensions(config_file: str) -> dict[str, dict]:
+    """Returns the raw scenario definitions of a simulation config file,
+    keyed by scenario id. Used to read scenario settings that extend the
+    simulation config schema (e.g., population and steady state settings)."""
+    with open(config_file, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+    return {
+        scenario['id']: scenario
+        for scenario in data.get('scenarios', [])
+        if 'id' in scenario
+    }
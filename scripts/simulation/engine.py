@@ -0,0 +1,434 @@
+import os
+from dataclasses import dataclass
+import numpy as np
+import libsbml as ls
+from sbmlpbkutils import load_config
+from simulation.simulator import load_simulator
+from parameters.store import get_parameter_store, get_model_element_ids
+from simulation.linear import get_linear_structure_issue, get_linear_system, simulate_linear_system
+from simulation.recording import RecordingOptions, OutputRecorder
+from simulation.units import get_time_conversion_factor, get_amount_conversion_factor, \
+    get_selection_unit
+
+# Solvers: the matrix exponential solver for linear time-invariant models with
+# fallback to the ODE integrator (auto), or either one explicitly
+SOLVERS = ['auto', 'linear', 'ode']
+
+@dataclass
+class ScenarioResult:
+    model_instance_id: str
+    output_ids: list[str]
+    # Evaluation times in scenario time units
+    time: np.ndarray
+    # Output values in model units, one column per output
+    values: np.ndarray
+    # Time at which periodic steady state was detected (if any), after which
+    # the outputs were extrapolated
+    steady_state_time: float = None
+    # Model units of the outputs (None if not specified by the model)
+    output_units: list[str] = None
+    # AUC, maximum and final value of the outputs at full resolution
+    # (metrics x outputs), if recorded
+    summary: np.ndarray = None
+
+@dataclass
+class SteadyStateOptions:
+    # Relative and absolute tolerance on the extrapolation error of the outputs
+    rtol: float = 1e-4
+    atol: float = 1e-12
+    # Minimum number of dosing periods to simulate before extrapolating
+    min_periods: int = 3
+
+def get_steady_state_options(extensions: dict) -> SteadyStateOptions | None:
+    """Returns the periodic steady state options from the (raw) scenario
+    definition, or None if the steady state fast path is not enabled."""
+    settings = extensions.get('steady_state')
+    if not settings:
+        return None
+    if settings is True:
+        return SteadyStateOptions()
+    return SteadyStateOptions(**settings)
+
+def get_solver(extensions: dict) -> str:
+    """Returns the solver from the (raw) scenario definition."""
+    solver = str(extensions.get('solver', 'auto')).lower()
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver [{solver}], expected one of {SOLVERS}.")
+    return solver
+
+def read_parameter_file(param_file: str) -> dict[str, float]:
+    return get_parameter_store().get_values(param_file)
+
+# Dosing event types supported by the engine
+DOSING_EVENT_TYPES = ['single_bolus', 'repeated_bolus']
+
+def get_event_type(event) -> str:
+    return str(getattr(event.type, 'value', event.type)).lower()
+
+def get_dose_times(event, duration: float) -> np.ndarray:
+    """Returns the dosing times (in scenario time units) of a dosing event."""
+    event_type = get_event_type(event)
+    if event_type == 'single_bolus':
+        return np.array([event.time], dtype=float)
+    if event_type == 'repeated_bolus':
+        until = getattr(event, 'until', None)
+        end = duration if until is None else min(until, duration)
+        return np.arange(event.time, end, event.interval, dtype=float)
+    raise ValueError(f"Unsupported dosing event type [{event_type}], expected one of {DOSING_EVENT_TYPES}.")
+
+def get_dosing_period(scenario) -> float | None:
+    """Returns the period of the dosing regimen of the scenario if all dosing
+    events are repeated boluses with the same interval that continue until
+    the end of the simulation, or None otherwise."""
+    intervals = set()
+    for event in scenario.dosing_events:
+        until = getattr(event, 'until', None)
+        if get_event_type(event) != 'repeated_bolus' \
+            or (until is not None and until < scenario.duration):
+            return None
+        intervals.add(float(event.interval))
+    return intervals.pop() if len(intervals) == 1 else None
+
+class ModelInstanceSimulator:
+    """Simulates scenarios for a model instance of a simulation config. The
+    model is loaded once, after which it can be simulated any number of times
+    with different scenarios and parameter values."""
+
+    def __init__(self, model_instance):
+        self.model_instance = model_instance
+        self.target_mappings = dict(model_instance.target_mappings or {})
+        self.rr = load_simulator(model_instance.model_path)
+        self.document = ls.readSBML(model_instance.model_path)
+        self.model = self.document.getModel()
+        param_file = getattr(model_instance, 'param_file', None)
+        self.parameter_issues = get_parameter_store().validate(param_file, self.model) \
+            if param_file else []
+        # Values of ids that the model does not define are reported by the
+        # validation and left out
+        element_ids = get_model_element_ids(self.model)
+        self.parameters = {
+            parameter_id: value
+            for parameter_id, value in (read_parameter_file(param_file) if param_file else {}).items()
+            if parameter_id in element_ids
+        }
+        self.set_parameters(self.parameters)
+        self.linear_structure_issue = get_linear_structure_issue(self.model)
+        # Values (parameterisation or model) of the parameters overridden by
+        # the last simulation
+        self.overridden = {}
+
+    def set_parameters(self, parameters: dict[str, float]):
+        for parameter_id, value in parameters.items():
+            self.rr.setValue(parameter_id, float(value))
+
+    def set_overrides(self, overrides: dict[str, float]):
+        """Overrides parameter values for the next simulation. Parameters
+        overridden by the previous simulation but not by this one are
+        restored, so that only the differences between simulations are set
+        and the parameterisation need not be applied again."""
+        for parameter_id, value in self.overridden.items():
+            if parameter_id not in overrides:
+                self.rr.setValue(parameter_id, value)
+        self.overridden = {
+            parameter_id: self.overridden[parameter_id] if parameter_id in self.overridden
+                else float(self.rr.getValue(parameter_id))
+            for parameter_id in overrides
+        }
+        self.set_parameters(overrides)
+
+    def get_parameter_value(self, parameter_id: str) -> float:
+        if parameter_id in self.overridden:
+            return self.overridden[parameter_id]
+        if parameter_id in self.parameters:
+            return self.parameters[parameter_id]
+        return float(self.rr.getValue(parameter_id))
+
+    def get_target(self, target: str) -> str:
+        return self.target_mappings.get(target, target)
+
+    def get_dosing_schedule(self, scenario) -> list[tuple[float, str, float]]:
+        """Returns the doses of the scenario as sorted (time, species, amount)
+        tuples, with times in scenario units and amounts in model units."""
+        amount_factor = get_amount_conversion_factor(
+            self.model,
+            scenario.amount_unit,
+            getattr(scenario, 'molar_mass', None)
+        )
+        doses = []
+        for event in scenario.dosing_events:
+            species = self.get_target(event.target)
+            if species.startswith('['):
+                raise ValueError(f"Dosing target [{event.target}] must map to a species amount.")
+            for time in get_dose_times(event, scenario.duration):
+                doses.append((float(time), species, event.amount * amount_factor))
+        return sorted(doses)
+
+    def simulate(
+        self,
+        scenario,
+        parameters: dict[str, float] = None,
+        steady_state: SteadyStateOptions = None,
+        solver: str = 'auto',
+        recording: RecordingOptions = None
+    ) -> ScenarioResult:
+        """Simulates the scenario, integrating piecewise between dosing times
+        and applying each bolus dose as a jump of the target species amount.
+        If steady state options are specified and the dosing regimen is
+        periodic, the simulation stops once the outputs reached a periodic
+        steady state and the last period is repeated until the end.
+        Linear time-invariant models are solved with matrix exponentials
+        instead, unless the ODE solver is requested. Only the scenario
+        outputs are recorded; the recording options can reduce these to a
+        subset of the evaluation times and/or summary metrics."""
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown solver [{solver}], expected one of {SOLVERS}.")
+        time_factor = get_time_conversion_factor(self.model, scenario.time_unit)
+
+        # Apply scenario parameters and extra parameters on top of the
+        # parameterisation, then reset species and time to their initial
+        # values
+        self.set_overrides({ **(getattr(scenario, 'parameters', None) or {}), **(parameters or {}) })
+        self.rr.reset()
+
+        output_ids = [output.id for output in scenario.outputs]
+        selections = [self.get_target(output.output) for output in scenario.outputs]
+        output_units = [get_selection_unit(self.model, selection) for selection in selections]
+        self.rr.timeCourseSelections = ['time'] + selections
+
+        duration = float(scenario.duration)
+        num_steps = int(round(duration * scenario.evaluation_resolution))
+        times = np.linspace(0., duration, num_steps + 1)
+
+        doses = [dose for dose in self.get_dosing_schedule(scenario) if dose[0] < duration]
+        recorder = OutputRecorder(times, len(selections), recording)
+
+        steady_state_time = None
+        issue = None
+        if solver != 'ode':
+            issue = self.simulate_linear(scenario, doses, num_steps, time_factor, recorder)
+            if issue is not None and solver == 'linear':
+                raise ValueError(
+                    f"Model instance [{self.model_instance.id}] cannot be simulated with the linear solver: {issue}."
+                )
+        if solver == 'ode' or issue is not None:
+            steady_state_time = self.simulate_segmented(
+                scenario,
+                doses,
+                times,
+                time_factor,
+                recorder,
+                steady_state
+            )
+        return ScenarioResult(
+            model_instance_id=self.model_instance.id,
+            output_ids=output_ids,
+            time=recorder.get_time(),
+            values=recorder.get_values(),
+            steady_state_time=steady_state_time,
+            output_units=output_units,
+            summary=recorder.get_summary()
+        )
+
+    def simulate_segmented(
+        self,
+        scenario,
+        doses: list[tuple[float, str, float]],
+        times: np.ndarray,
+        time_factor: float,
+        recorder: OutputRecorder,
+        steady_state: SteadyStateOptions = None
+    ) -> float | None:
+        """Integrates the model with the ODE solver piecewise between dose
+        times, from the current (initial) state. Each bolus is applied as a
+        direct jump of the target species amount, after which the integrator
+        restarts from the new state, so that the solver never has to locate
+        discontinuities through model events or root-finding. The output
+        values at the evaluation times are passed to the recorder. Returns
+        the time at which periodic steady state was detected (if any)."""
+        num_steps = len(times) - 1
+        step_size = float(scenario.duration) / num_steps
+
+        # Dose times as (fractional) evaluation step positions; doses at
+        # evaluation times are snapped to the grid
+        dose_positions = {}
+        for time, species, amount in doses:
+            position = time / step_size
+            if abs(position - round(position)) <= 1e-9 * max(1., position):
+                position = float(round(position))
+            dose_positions.setdefault(position, []).append((species, amount))
+        boundaries = sorted({0.} | set(dose_positions) | {float(num_steps)})
+
+        # Number of evaluation steps per dosing period, if the steady state fast
+        # path applies to this scenario
+        period = get_dosing_period(scenario) if steady_state else None
+        period_steps = period * scenario.evaluation_resolution if period else 0
+        if period_steps < 1 or not float(period_steps).is_integer():
+            period_steps = 0
+        period_steps = int(period_steps)
+        periodic_start = max((event.time for event in scenario.dosing_events), default=0.)
+        periodic_start_step = int(round(periodic_start * scenario.evaluation_resolution))
+        previous_change = None
+        previous_check = None
+        next_check = max(2, steady_state.min_periods) if period_steps else 0
+        # Values of the last two dosing periods, for the steady state checks
+        recent = np.empty((0, len(self.rr.timeCourseSelections) - 1))
+
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            for species, amount in dose_positions.get(start, []):
+                self.rr.setValue(species, self.rr.getValue(species) + amount)
+
+            # Record evaluation steps in [start, end), and end for the last
+            # segment; segment bounds off the grid are integrated but not
+            # recorded
+            is_last = end == num_steps
+            first = int(np.ceil(start))
+            stop = num_steps + 1 if is_last else int(np.ceil(end))
+            segment_times = times[first:stop]
+            offset = int(first != start)
+            if offset:
+                segment_times = np.concatenate(([start * step_size], segment_times))
+            if not is_last:
+                segment_times = np.append(segment_times, end * step_size)
+            result = np.asarray(self.rr.simulate(times=segment_times * time_factor))
+            segment_values = result[offset:offset + stop - first, 1:]
+            recorder.record(first, segment_values)
+            if period_steps:
+                recent = np.concatenate((recent, segment_values))[-2 * period_steps:]
+
+            # Check for periodic steady state at the end of each dosing period
+            if period_steps and not is_last and end.is_integer():
+                step = int(end)
+                periods, remainder = divmod(step - periodic_start_step, period_steps)
+                if remainder != 0 or periods < next_check:
+                    continue
+                last = recent[period_steps:]
+                change = np.abs(last - recent[:period_steps])
+                remaining_periods = -(-(num_steps + 1 - step) // period_steps)
+                periods_between = periods - previous_check if previous_check is not None else None
+                if is_periodic_steady_state(
+                    last,
+                    change,
+                    previous_change,
+                    periods_between,
+                    remaining_periods,
+                    steady_state
+                ):
+                    # Repeat the last period until the end of the simulation
+                    recorder.record_periodic(step, last, num_steps + 1 - step)
+                    return float(times[step])
+                # Check less often as the simulation proceeds, so that the
+                # overhead stays small for regimens that never converge
+                previous_change = change
+                previous_check = periods
+                next_check = periods + max(1, periods // 16)
+
+        return None
+
+    def simulate_linear(
+        self,
+        scenario,
+        doses: list[tuple[float, str, float]],
+        num_steps: int,
+        time_factor: float,
+        recorder: OutputRecorder
+    ) -> str | None:
+        """Simulates the doses with the matrix exponential solver, from the
+        current (initial) state, passing the output values to the recorder.
+        Returns None, or the reason if the model is not linear time-invariant
+        or if the doses are not given at evaluation times (in which case
+        nothing is recorded)."""
+        if self.linear_structure_issue:
+            return self.linear_structure_issue
+        species_ids = list(self.rr.model.getFloatingSpeciesIds())
+        initial_amounts = self.rr.model.getFloatingSpeciesAmounts()
+        dose_amounts = {}
+        for time, species, amount in doses:
+            step = time * scenario.evaluation_resolution
+            if abs(step - round(step)) > 1e-9 * max(1., step):
+                return f"dose time {time} is not an evaluation time"
+            if species not in species_ids:
+                return f"dosing target [{species}] is not a floating species"
+            amounts = dose_amounts.setdefault(int(round(step)), np.zeros(len(species_ids)))
+            amounts[species_ids.index(species)] += amount
+
+        # Probe linearity at the order of magnitude of the dosed amounts
+        scale = sum(abs(dose[2]) for dose in doses) or np.max(np.abs(initial_amounts), initial=0.) or 1.
+        system = get_linear_system(self.rr, self.rr.timeCourseSelections[1:], scale)
+        if system is None:
+            return "reaction rates or outputs are not linear in the species amounts"
+        simulate_linear_system(
+            system,
+            initial_amounts,
+            time_factor / scenario.evaluation_resolution,
+            num_steps,
+            dose_amounts,
+            recorder.record
+        )
+        return None
+
+# Model instance simulators loaded in this (worker) process, keyed by model
+# file, parameterisation file and target mappings, so that model instances
+# with the same definition (e.g., in different configs) share a simulator
+_simulators = {}
+
+# Configs and model instances, keyed by config file and model instance id
+_model_instances = {}
+
+def get_model_instance_key(model_instance) -> tuple:
+    param_file = getattr(model_instance, 'param_file', None)
+    return (
+        os.path.abspath(model_instance.model_path),
+        os.path.abspath(param_file) if param_file else None,
+        tuple(sorted((model_instance.target_mappings or {}).items()))
+    )
+
+def get_model_instance_simulator(model_instance, logger=None) -> ModelInstanceSimulator:
+    """Returns the simulator of a model instance, loading the model on first
+    use in this process. Issues with the parameterisation are logged (if a
+    logger is given) when the model is loaded. Simulators are shared by
+    model instances with the same definition, so the model instance id of
+    their results is that of the first one."""
+    key = get_model_instance_key(model_instance)
+    if key not in _simulators:
+        simulator = ModelInstanceSimulator(model_instance)
+        if logger is not None:
+            for issue in simulator.parameter_issues:
+                logger.warning("Model instance [%s]: %s", model_instance.id, issue.message)
+        _simulators[key] = simulator
+    return _simulators[key]
+
+def get_simulator(config_file: str, model_instance_id: str, logger=None) -> tuple[object, ModelInstanceSimulator]:
+    """Returns the config and the simulator of a model instance of a config
+    file (see get_model_instance_simulator)."""
+    key = (config_file, model_instance_id)
+    if key not in _model_instances:
+        config = load_config(config_file)
+        model_instance = next(m for m in config.model_instances if m.id == model_instance_id)
+        _model_instances[key] = (config, model_instance)
+    config, model_instance = _model_instances[key]
+    return config, get_model_instance_simulator(model_instance, logger)
+
+def get_num_simulators() -> int:
+    return len(_simulators)
+
+def is_periodic_steady_state(
+    last: np.ndarray,
+    change: np.ndarray,
+    previous_change: np.ndarray | None,
+    periods_between: int | None,
+    remaining_periods: int,
+    options: SteadyStateOptions
+) -> bool:
+    """Returns whether repeating the last period of the outputs for the
+    remaining periods stays within tolerance. The remaining drift is bounded
+    by the period-to-period change times the number of remaining periods or,
+    when the change decays geometrically with ratio r per period (estimated
+    from the change at the previous check), by change * r / (1 - r)."""
+    factor = remaining_periods
+    if previous_change is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(change > 0, change / previous_change, 0.)
+        ratio = np.nanmax(ratios) ** (1. / periods_between) if ratios.size else 0.
+        if ratio < 1:
+            factor = min(factor, ratio / (1 - ratio))
+    return bool(np.all(change * factor <= options.rtol * np.abs(last) + options.atol))
@@ -0,0 +1,191 @@
+from typing import Callable
+from dataclasses import dataclass
+import numpy as np
+import libsbml as ls
+from scipy.linalg import expm
+
+# Maximum number of matrix powers kept in memory while propagating the state
+# over long dose-free intervals
+MAX_POWERS = 1024
+
+@dataclass
+class LinearSystem:
+    species_ids: list[str]
+    # Species amount dynamics: d(amounts)/dt = A @ amounts + b
+    A: np.ndarray
+    b: np.ndarray
+    selections: list[str]
+    # Output values: C @ amounts + d
+    C: np.ndarray
+    d: np.ndarray
+
+def get_linear_structure_issue(model: ls.Model) -> str | None:
+    """Returns the reason why the model is not a linear time-invariant system
+    in its species amounts, or None if it is. That is, all reaction rates must
+    be linear (or constant) in the species with coefficients that do not
+    depend on time, and the model must not have events or rate rules."""
+    if model.getNumEvents() > 0:
+        return "model has events"
+    if any(rule.isRate() or rule.isAlgebraic() for rule in model.getListOfRules()):
+        return "model has rate or algebraic rules"
+
+    # Expand function definitions on a copy, so that kinetic laws only refer
+    # to built-in functions
+    document = model.getSBMLDocument().clone()
+    properties = ls.ConversionProperties()
+    properties.addOption('expandFunctionDefinitions', True)
+    document.convert(properties)
+    model = document.getModel()
+
+    rules = {
+        rule.getVariable(): rule.getMath()
+        for rule in model.getListOfRules()
+        if rule.isAssignment()
+    }
+    state_species = {
+        species.getId()
+        for species in model.getListOfSpecies()
+        if not species.getBoundaryCondition() and not species.getConstant()
+    }
+    degrees = {}
+
+    def get_symbol_degree(symbol: str) -> int | None:
+        if symbol not in degrees:
+            if symbol in rules:
+                degrees[symbol] = get_degree(rules[symbol], get_symbol_degree)
+            else:
+                degrees[symbol] = 1 if symbol in state_species else 0
+        return degrees[symbol]
+
+    for reaction in model.getListOfReactions():
+        kinetic_law = reaction.getKineticLaw()
+        if kinetic_law is None or kinetic_law.getMath() is None:
+            return f"reaction [{reaction.getId()}] has no kinetic law"
+        # Local parameters shadow global symbols and are constant
+        local_ids = {p.getId() for p in kinetic_law.getListOfLocalParameters()} \
+            | {p.getId() for p in kinetic_law.getListOfParameters()}
+        degree = get_degree(
+            kinetic_law.getMath(),
+            lambda symbol: 0 if symbol in local_ids else get_symbol_degree(symbol)
+        )
+        if degree is None:
+            return f"rate of reaction [{reaction.getId()}] is not linear in the species amounts"
+    return None
+
+def get_degree(ast: ls.ASTNode, get_symbol_degree) -> int | None:
+    """Returns the polynomial degree of the expression in the species amounts
+    if it is constant (0) or linear (1), or None otherwise (including any
+    explicit dependency on time)."""
+    node_type = ast.getType()
+    if node_type in (ls.AST_NAME_TIME, ls.AST_FUNCTION_DELAY, ls.AST_FUNCTION_RATE_OF):
+        return None
+    if ast.isNumber() or ast.isConstant() or node_type == ls.AST_NAME_AVOGADRO:
+        return 0
+    if node_type == ls.AST_NAME:
+        return get_symbol_degree(ast.getName())
+
+    children = [ast.getChild(i) for i in range(ast.getNumChildren())]
+    child_degrees = [get_degree(child, get_symbol_degree) for child in children]
+    if any(degree is None for degree in child_degrees):
+        return None
+    if node_type in (ls.AST_PLUS, ls.AST_MINUS):
+        return max(child_degrees, default=0)
+    if node_type == ls.AST_TIMES:
+        degree = sum(child_degrees)
+        return degree if degree <= 1 else None
+    if node_type == ls.AST_DIVIDE:
+        return child_degrees[0] if child_degrees[1] == 0 else None
+    if node_type == ls.AST_FUNCTION_PIECEWISE:
+        # Pieces alternate values and conditions, optionally followed by an
+        # otherwise value; only value pieces may depend on the species
+        conditions = child_degrees[1::2] if len(children) % 2 == 0 else child_degrees[1:-1:2]
+        return max(child_degrees) if not any(conditions) else None
+    if node_type in (ls.AST_POWER, ls.AST_FUNCTION_POWER) \
+        and child_degrees[1] == 0 and children[1].isNumber() and children[1].getValue() == 1:
+        return child_degrees[0]
+    # Any other function is only allowed on constant arguments
+    return 0 if max(child_degrees, default=0) == 0 else None
+
+def get_linear_system(rr, selections: list[str], scale: float = 1.) -> LinearSystem | None:
+    """Builds the system and output matrices of a linear time-invariant model
+    from the reaction rates and output values of the loaded simulator, at the
+    current parameter values. The current state is restored afterwards.
+    Returns None if a probe at a random state (of the order of magnitude of
+    the specified scale) shows that the model is not linear after all."""
+    model = rr.model
+    species_ids = list(model.getFloatingSpeciesIds())
+    stoichiometry = rr.getFullStoichiometryMatrix()
+    rows = [list(stoichiometry.rownames).index(species_id) for species_id in species_ids]
+    N = np.asarray(stoichiometry)[rows]
+    amounts = model.getFloatingSpeciesAmounts()
+
+    def evaluate(x: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        model.setFloatingSpeciesAmounts(x)
+        rates = N @ model.getReactionRates()
+        values = np.array([rr.getValue(selection) for selection in selections], dtype=float)
+        return rates, values
+
+    try:
+        n = len(species_ids)
+        b, d = evaluate(np.zeros(n))
+        A = np.empty((n, n))
+        C = np.empty((len(selections), n))
+        for i in range(n):
+            rates, values = evaluate(np.eye(n)[i])
+            A[:, i] = rates - b
+            C[:, i] = values - d
+        x = scale * np.random.default_rng(0).uniform(0., 1., n)
+        rates, values = evaluate(x)
+    finally:
+        model.setFloatingSpeciesAmounts(amounts)
+
+    if not np.allclose(rates, A @ x + b, rtol=1e-6, atol=1e-12 * scale) \
+        or not np.allclose(values, C @ x + d, rtol=1e-6, atol=1e-12 * scale):
+        return None
+    return LinearSystem(species_ids, A, b, list(selections), C, d)
+
+def simulate_linear_system(
+    system: LinearSystem,
+    initial_amounts: np.ndarray,
+    step: float,
+    num_steps: int,
+    doses: dict[int, np.ndarray],
+    record: Callable[[int, np.ndarray], None] = None
+) -> np.ndarray | None:
+    """Evaluates the outputs of a linear system at num_steps + 1 equidistant
+    times (step in model time units), applying the dose amounts keyed by
+    step index as jumps of the species amounts. The state is propagated with
+    the matrix exponential of the system, so the cost does not depend on the
+    stiffness of the model. Returns a (times x outputs) array, or passes the
+    values to record (first step, values) in chunks if specified."""
+    n = len(system.species_ids)
+
+    # Augment the state with a constant 1 to include the constant input
+    M = np.zeros((n + 1, n + 1))
+    M[:n, :n] = system.A
+    M[:n, n] = system.b
+    transition = expm(M * step)
+    num_powers = min(num_steps + 1, MAX_POWERS) + 1
+    powers = np.empty((num_powers, n + 1, n + 1))
+    powers[0] = np.eye(n + 1)
+    for k in range(1, num_powers):
+        powers[k] = powers[k - 1] @ transition
+    C = np.hstack([system.C, system.d[:, None]])
+    output_powers = np.einsum('on,knm->kom', C, powers)
+
+    values = np.empty((num_steps + 1, len(system.selections))) if record is None else None
+    state = np.append(np.asarray(initial_amounts, dtype=float), 1.)
+    boundaries = sorted({0, num_steps + 1} | {s for s in doses if 0 <= s <= num_steps})
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        if start in doses:
+            state[:n] += doses[start]
+        # Propagate from dose to dose in chunks of at most MAX_POWERS steps
+        while start < end:
+            length = min(end - start, num_powers - 1)
+            if record is None:
+                values[start:start + length] = output_powers[:length] @ state
+            else:
+                record(start, output_powers[:length] @ state)
+            state = powers[length] @ state
+            start += length
+    return values
@@ -0,0 +1,286 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from sbmlpbkutils import load_config
+from simulation.config import load_scenario_extensions
+from simulation.engine import get_simulator, get_steady_state_options, get_solver
+
+DEFAULT_POPULATION_SIZE = 1000
+DEFAULT_PERCENTILES = [5, 50, 95]
+DEFAULT_BATCH_SIZE = 50
+
+def load_population_specs(config_file: str) -> dict[str, dict]:
+    """Returns the population specifications of the scenarios of a simulation
+    config file, keyed by scenario id."""
+    return {
+        scenario_id: extensions['population']
+        for scenario_id, extensions in load_scenario_extensions(config_file).items()
+        if extensions.get('population')
+    }
+
+def sample_parameters(
+    spec: dict,
+    base_values: dict[str, float],
+    size: int,
+    rng: np.random.Generator
+) -> tuple[list[str], np.ndarray]:
+    """Draws parameter values for the individuals of a population. Returns
+    the parameter ids and a (size x parameters) array of sampled values.
+    Distributions are centred on the base value of each parameter unless a
+    mean (normal) or median (lognormal) is specified."""
+    parameter_ids = list(spec.get('parameters', {}).keys())
+    samples = np.empty((size, len(parameter_ids)))
+    for i, parameter_id in enumerate(parameter_ids):
+        definition = spec['parameters'][parameter_id]
+        distribution = definition.get('distribution', 'normal').lower()
+        base = base_values[parameter_id]
+        if distribution == 'normal':
+            mean = definition.get('mean', base)
+            sd = definition['sd'] if 'sd' in definition else definition['cv'] * abs(mean)
+            values = rng.normal(mean, sd, size)
+        elif distribution == 'lognormal':
+            median = definition.get('median', base)
+            if 'gsd' in definition:
+                sigma = np.log(definition['gsd'])
+            else:
+                sigma = np.sqrt(np.log(1 + definition['cv'] ** 2))
+            values = median * np.exp(rng.normal(0., sigma, size))
+        elif distribution == 'uniform':
+            values = rng.uniform(definition['min'], definition['max'], size)
+        else:
+            raise ValueError(
+                f"Unsupported distribution [{distribution}] for parameter [{parameter_id}]."
+            )
+        if 'min' in definition or 'max' in definition:
+            values = np.clip(values, definition.get('min', -np.inf), definition.get('max', np.inf))
+        samples[:, i] = values
+    return parameter_ids, samples
+
+class StreamingPercentiles:
+    """Streaming estimates of percentiles (P-square algorithm, Jain and
+    Chlamtac, 1985) and means of a stream of equally shaped arrays. Memory
+    use is independent of the number of observations."""
+
+    def __init__(self, percentiles: list[float], shape: tuple[int, ...]):
+        self.percentiles = list(percentiles)
+        self.shape = tuple(shape)
+        p = np.asarray(self.percentiles, dtype=float) / 100.
+        expand = (slice(None),) + (None,) * len(self.shape)
+        self._desired = np.stack([np.ones_like(p), 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5 * np.ones_like(p)], axis=-1)[expand]
+        self._increments = np.stack([np.zeros_like(p), p / 2, p, (1 + p) / 2, np.ones_like(p)], axis=-1)[expand]
+        self._buffer = []
+        self._heights = None
+        self._positions = None
+        self.count = 0
+        self.sum = np.zeros(self.shape)
+
+    def update(self, x: np.ndarray):
+        x = np.asarray(x, dtype=float)
+        self.count += 1
+        self.sum += x
+        if self.count <= 5:
+            self._buffer.append(x)
+            if self.count == 5:
+                heights = np.sort(np.stack(self._buffer, axis=-1), axis=-1)
+                full_shape = (len(self.percentiles),) + self.shape + (5,)
+                self._heights = np.broadcast_to(heights, full_shape).copy()
+                self._positions = np.broadcast_to(np.arange(1., 6.), full_shape).copy()
+            return
+
+        q = self._heights
+        n = self._positions
+        x = np.broadcast_to(x, q.shape[:-1])
+
+        # Update extreme markers and increment positions of markers above x
+        q[..., 0] = np.minimum(q[..., 0], x)
+        q[..., 4] = np.maximum(q[..., 4], x)
+        for i in range(1, 4):
+            n[..., i] += x < q[..., i]
+        n[..., 4] += 1
+        self._desired = self._desired + self._increments
+
+        # Adjust heights of middle markers that are off their desired positions
+        for i in range(1, 4):
+            d = self._desired[..., i] - n[..., i]
+            up = (d >= 1) & (n[..., i + 1] - n[..., i] > 1)
+            down = (d <= -1) & (n[..., i - 1] - n[..., i] < -1)
+            move = up | down
+            if not move.any():
+                continue
+            s = np.where(up, 1., -1.)
+            qi, qm, qp = q[..., i], q[..., i - 1], q[..., i + 1]
+            ni, nm, np_ = n[..., i], n[..., i - 1], n[..., i + 1]
+            parabolic = qi + s / (np_ - nm) * (
+                (ni - nm + s) * (qp - qi) / (np_ - ni) + (np_ - ni - s) * (qi - qm) / (ni - nm)
+            )
+            linear = qi + s * (np.where(up, qp, qm) - qi) / (np.where(up, np_, nm) - ni)
+            adjusted = np.where((qm < parabolic) & (parabolic < qp), parabolic, linear)
+            q[..., i] = np.where(move, adjusted, qi)
+            n[..., i] = np.where(move, ni + s, ni)
+
+    def get_percentiles(self) -> np.ndarray:
+        """Returns the percentile estimates, with the percentiles along the
+        first axis."""
+        if self.count == 0:
+            return np.full((len(self.percentiles),) + self.shape, np.nan)
+        if self.count <= 5:
+            return np.percentile(np.stack(self._buffer), self.percentiles, axis=0)
+        return self._heights[..., 2].copy()
+
+    def get_mean(self) -> np.ndarray:
+        return self.sum / self.count if self.count > 0 else np.full(self.shape, np.nan)
+
+@dataclass
+class PopulationResult:
+    model_instance_id: str
+    output_ids: list[str]
+    time: np.ndarray
+    percentiles: list[float]
+    # Percentile values (percentiles x times x outputs)
+    values: np.ndarray
+    # Mean values (times x outputs)
+    mean: np.ndarray
+    size: int
+    # Times at which the individuals reached periodic steady state (NaN for
+    # individuals that did not)
+    steady_state_times: np.ndarray = None
+
+def simulate_individuals(
+    config_file: str,
+    model_instance_id: str,
+    scenario_id: str,
+    parameter_ids: list[str],
+    samples: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Simulates a batch of individuals with the loaded simulator of this
+    process. Returns an (individuals x times x outputs) array and the time at
+    which each individual reached periodic steady state (NaN if not)."""
+    config, simulator = get_simulator(config_file, model_instance_id)
+    scenario = next(s for s in config.scenarios if s.id == scenario_id)
+    extensions = load_scenario_extensions(config_file).get(scenario_id, {})
+    steady_state = get_steady_state_options(extensions)
+    solver = get_solver(extensions)
+    results = []
+    steady_state_times = np.full(len(samples), np.nan)
+    for i, row in enumerate(samples):
+        result = simulator.simulate(scenario, dict(zip(parameter_ids, row)), steady_state, solver)
+        results.append(result.values)
+        if result.steady_state_time is not None:
+            steady_state_times[i] = result.steady_state_time
+    return np.stack(results), steady_state_times
+
+def run_population_simulation(
+    config_file: str,
+    scenario_id: str,
+    spec: dict,
+    jobs: int = 1
+) -> list[PopulationResult]:
+    """Runs the population simulation of a scenario for all model instances
+    of a config. Individuals are simulated in batches, across worker
+    processes if jobs > 1, and aggregated into streaming percentiles."""
+    config = load_config(config_file)
+    scenario = next(s for s in config.scenarios if s.id == scenario_id)
+    size = int(spec.get('size', DEFAULT_POPULATION_SIZE))
+    percentiles = spec.get('percentiles', DEFAULT_PERCENTILES)
+    batch_size = int(spec.get('batch_size', DEFAULT_BATCH_SIZE))
+    extensions = load_scenario_extensions(config_file).get(scenario_id, {})
+
+    results = []
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    try:
+        for model_instance in config.model_instances:
+            _, simulator = get_simulator(config_file, model_instance.id)
+
+            # Base values: parameterisation, overridden by scenario parameters
+            scenario_parameters = getattr(scenario, 'parameters', None) or {}
+            base_values = {
+                parameter_id: scenario_parameters.get(parameter_id, simulator.get_parameter_value(parameter_id))
+                for parameter_id in spec.get('parameters', {})
+            }
+            rng = np.random.default_rng(spec.get('seed'))
+            parameter_ids, samples = sample_parameters(spec, base_values, size, rng)
+
+            batches = [samples[i:i + batch_size] for i in range(0, size, batch_size)]
+            args = (config_file, model_instance.id, scenario_id, parameter_ids)
+            if executor is not None:
+                batch_results = executor.map(simulate_individuals, *zip(*[args + (b,) for b in batches]))
+            else:
+                batch_results = (simulate_individuals(*args, b) for b in batches)
+
+            reference = simulator.simulate(scenario, solver=get_solver(extensions))
+            aggregator = StreamingPercentiles(percentiles, reference.values.shape)
+            steady_state_times = []
+            for batch_values, batch_steady_state_times in batch_results:
+                for values in batch_values:
+                    aggregator.update(values)
+                steady_state_times.append(batch_steady_state_times)
+
+            results.append(PopulationResult(
+                model_instance_id=model_instance.id,
+                output_ids=reference.output_ids,
+                time=reference.time,
+                percentiles=list(percentiles),
+                values=aggregator.get_percentiles(),
+                mean=aggregator.get_mean(),
+                size=size,
+                steady_state_times=np.concatenate(steady_state_times)
+            ))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return results
+
+def write_population_results(results: list[PopulationResult], out_file: str):
+    """Writes population percentiles to a CSV file in long format, with one
+    row per model instance, output and time."""
+    frames = []
+    for result in results:
+        for j, output_id in enumerate(result.output_ids):
+            frame = pd.DataFrame({
+                'model_instance': result.model_instance_id,
+                'output': output_id,
+                'time': result.time,
+                'mean': result.mean[:, j]
+            })
+            for k, percentile in enumerate(result.percentiles):
+                frame[f"p{percentile:g}"] = result.values[k, :, j]
+            frames.append(frame)
+    os.makedirs(os.path.dirname(out_file) or '.', exist_ok=True)
+    pd.concat(frames).to_csv(out_file, index=False)
+
+def plot_population_results(config, scenario, results_file: str, out_path: str):
+    """Plots the median and outer percentile band of each model instance for
+    each output of the scenario."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    df = pd.read_csv(results_file)
+    percentile_columns = sorted(
+        [c for c in df.columns if c.startswith('p') and c[1:].replace('.', '', 1).isdigit()],
+        key=lambda c: float(c[1:])
+    )
+    labels = { m.id: m.label for m in config.model_instances }
+    for output in scenario.outputs:
+        fig, ax = plt.subplots(figsize=(8, 5))
+        df_output = df[df['output'] == output.id]
+        for model_instance_id, df_instance in df_output.groupby('model_instance', sort=False):
+            label = labels.get(model_instance_id, model_instance_id)
+            center = 'p50' if 'p50' in percentile_columns else 'mean'
+            line, = ax.plot(df_instance['time'], df_instance[center], label=label)
+            if len(percentile_columns) >= 2:
+                ax.fill_between(
+                    df_instance['time'],
+                    df_instance[percentile_columns[0]],
+                    df_instance[percentile_columns[-1]],
+                    color=line.get_color(),
+                    alpha=0.2
+                )
+        ax.set_xlabel(f"Time ({scenario.time_unit.value})")
+        ax.set_ylabel(output.label)
+        ax.legend()
+        fig.tight_layout()
+        fig.savefig(os.path.join(out_path, f"{scenario.id}_{output.id}_population.png"))
+        plt.close(fig)
@@ -0,0 +1,122 @@
+from dataclasses import dataclass
+import numpy as np
+
+# Summary metrics of the output time courses (same order as the sensitivity
+# analysis metrics)
+SUMMARY_METRICS = ['auc', 'max', 'final']
+
+@dataclass
+class RecordingOptions:
+    # Keep every n-th evaluation time (and the last one)
+    every: int = 1
+    # Keep at most this many evaluation times (overrides every if coarser)
+    max_points: int = None
+    # Only record the summary metrics, no time courses
+    summary_only: bool = False
+
+def get_recording_options(extensions: dict) -> RecordingOptions | None:
+    """Returns the recording options of a scenario (the recording section of
+    the scenario), or None to record the outputs at all evaluation times."""
+    recording = extensions.get('recording')
+    if not recording:
+        return None
+    if recording in ('summary', 'summary_only'):
+        return RecordingOptions(summary_only=True)
+    if not isinstance(recording, dict):
+        raise ValueError(f"Invalid recording settings [{recording}].")
+    options = RecordingOptions(
+        every=int(recording.get('every', 1)),
+        max_points=int(recording['max_points']) if recording.get('max_points') else None,
+        summary_only=bool(recording.get('summary_only', False))
+    )
+    if options.every < 1 or (options.max_points is not None and options.max_points < 2):
+        raise ValueError(f"Invalid recording settings [{recording}].")
+    return options
+
+class OutputRecorder:
+    """Records the output values that the solvers produce in chunks of
+    consecutive evaluation steps. Depending on the options, it keeps all
+    evaluation times, a regular subset of them, and/or running summary
+    metrics (computed at full resolution), so that memory use does not grow
+    with the number of evaluation steps that are not kept."""
+
+    def __init__(self, times: np.ndarray, num_outputs: int, options: RecordingOptions = None):
+        self.times = times
+        self.num_steps = len(times) - 1
+        self.step_size = float(times[1] - times[0]) if len(times) > 1 else 0.
+        every = options.every if options else 1
+        if options and options.max_points:
+            every = max(every, -(-self.num_steps // (options.max_points - 1)))
+        self.every = every
+        if options and options.summary_only:
+            self.steps = np.empty(0, dtype=int)
+        elif every == 1:
+            self.steps = np.arange(self.num_steps + 1)
+        else:
+            self.steps = np.unique(np.append(np.arange(0, self.num_steps + 1, every), self.num_steps))
+        self.values = np.empty((len(self.steps), num_outputs))
+
+        # Running summary metrics, only if evaluation times are left out
+        self.has_summary = options is not None
+        self._auc = np.zeros(num_outputs)
+        self._max = np.full(num_outputs, -np.inf)
+        self._last = None
+
+    @property
+    def is_full(self) -> bool:
+        return len(self.steps) == self.num_steps + 1
+
+    def record(self, first: int, values: np.ndarray):
+        """Records the output values (rows) of the evaluation steps starting
+        at first. Chunks must be recorded in order and without gaps."""
+        if len(values) == 0:
+            return
+        if self.is_full:
+            self.values[first:first + len(values)] = values
+        elif len(self.steps):
+            lo, hi = np.searchsorted(self.steps, [first, first + len(values)])
+            self.values[lo:hi] = values[self.steps[lo:hi] - first]
+        if self.has_summary:
+            auc = np.sum(values[1:] + values[:-1], axis=0)
+            if self._last is not None:
+                auc += self._last + values[0]
+            self._auc += auc * self.step_size / 2
+            self._max = np.maximum(self._max, np.max(values, axis=0))
+            self._last = values[-1].copy()
+
+    def record_periodic(self, first: int, period: np.ndarray, num_rows: int):
+        """Records num_rows evaluation steps starting at first that repeat
+        the values of a period (e.g., after periodic steady state)."""
+        if num_rows <= 0:
+            return
+        period_steps = len(period)
+        if self.is_full:
+            self.values[first:first + num_rows] = period[np.arange(num_rows) % period_steps]
+        elif len(self.steps):
+            lo, hi = np.searchsorted(self.steps, [first, first + num_rows])
+            self.values[lo:hi] = period[(self.steps[lo:hi] - first) % period_steps]
+        if self.has_summary:
+            # Trapezoidal AUC of the repeated sequence, including the step
+            # from the last recorded value
+            num_periods, remainder = divmod(num_rows, period_steps)
+            total = num_periods * np.sum(period, axis=0) + np.sum(period[:remainder], axis=0)
+            last = period[(num_rows - 1) % period_steps]
+            auc = 2 * total - period[0] - last
+            if self._last is not None:
+                auc += self._last + period[0]
+            self._auc += auc * self.step_size / 2
+            self._max = np.maximum(self._max, np.max(period[:num_rows], axis=0))
+            self._last = last.copy()
+
+    def get_time(self) -> np.ndarray:
+        return self.times[self.steps]
+
+    def get_values(self) -> np.ndarray:
+        return self.values
+
+    def get_summary(self) -> np.ndarray | None:
+        """Returns the summary metrics (metrics x outputs), or None if these
+        were not recorded."""
+        if not self.has_summary or self._last is None:
+            return None
+        return np.stack([self._auc, self._max, self._last])
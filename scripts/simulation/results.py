@@ -0,0 +1,163 @@
+import os
+import json
+import numpy as np
+from simulation.engine import ScenarioResult
+from simulation.recording import SUMMARY_METRICS
+
+RESULTS_FORMAT_VERSION = 1
+
+def get_results_files(out_path: str, scenario_id: str) -> tuple[str, str]:
+    """Returns the header (JSON) and data (NumPy) file of the results of a
+    scenario."""
+    base = os.path.join(out_path, f"{scenario_id}.results")
+    return f"{base}.json", f"{base}.npy"
+
+def get_results_data(scenario, results: list[ScenarioResult]) -> tuple[dict, np.ndarray]:
+    """Returns the header and the column-major data array of the results of
+    all model instances of a scenario, with the time as the first column
+    followed by one column per model instance and output. Summary metrics
+    of the outputs, if recorded, are stored with the columns in the header."""
+    time = results[0].time if results else np.empty(0)
+    columns = [{ 'name': 'time', 'unit': str(getattr(scenario.time_unit, 'value', scenario.time_unit)) }]
+    data = np.empty((len(time), 1 + sum(len(r.output_ids) for r in results)), order='F')
+    data[:, 0] = time
+    for result in results:
+        units = result.output_units or [None] * len(result.output_ids)
+        for j, output_id in enumerate(result.output_ids):
+            data[:, len(columns)] = result.values[:, j]
+            column = {
+                'name': f"{result.model_instance_id}/{output_id}",
+                'model_instance': result.model_instance_id,
+                'output': output_id,
+                'unit': units[j]
+            }
+            if result.summary is not None:
+                column['summary'] = {
+                    metric: float(result.summary[k, j]) for k, metric in enumerate(SUMMARY_METRICS)
+                }
+            columns.append(column)
+    header = {
+        'version': RESULTS_FORMAT_VERSION,
+        'scenario': scenario.id,
+        'data_file': f"{scenario.id}.results.npy",
+        'num_times': len(time),
+        'columns': columns,
+        'steady_state_times': {
+            r.model_instance_id: r.steady_state_time
+            for r in results
+            if r.steady_state_time is not None
+        }
+    }
+    return header, data
+
+def write_scenario_results(scenario, results: list[ScenarioResult], out_path: str):
+    """Writes the results of all model instances of a scenario to a single
+    column-major NumPy file and a JSON header describing the columns and
+    their units. Storing columns contiguously allows reading a single output
+    without reading the other columns."""
+    header_file, data_file = get_results_files(out_path, scenario.id)
+    header, data = get_results_data(scenario, results)
+    os.makedirs(out_path, exist_ok=True)
+    np.save(data_file, data)
+    with open(header_file, 'w', encoding='utf-8') as f:
+        json.dump(header, f, indent=2)
+
+class ScenarioResults:
+    """Results of a scenario written by write_scenario_results. The data file
+    is memory-mapped on first access, so that only the columns that are
+    requested are read from disk."""
+
+    def __init__(self, out_path: str, scenario_id: str):
+        header_file, self.data_file = get_results_files(out_path, scenario_id)
+        with open(header_file, 'r', encoding='utf-8') as f:
+            self._set_header(json.load(f))
+        self._data = None
+
+    @classmethod
+    def from_data(cls, header: dict, data: np.ndarray) -> 'ScenarioResults':
+        """Returns the results of a scenario held in memory (e.g., received
+        from the simulation service)."""
+        results = cls.__new__(cls)
+        results.data_file = None
+        results._set_header(header)
+        results._data = data
+        return results
+
+    def _set_header(self, header: dict):
+        self.header = header
+        self.columns = header['columns']
+        self._index = { column['name']: i for i, column in enumerate(self.columns) }
+
+    @property
+    def data(self) -> np.ndarray:
+        if self._data is None:
+            self._data = np.load(self.data_file, mmap_mode='r')
+        return self._data
+
+    @property
+    def model_instance_ids(self) -> list[str]:
+        return list(dict.fromkeys(c['model_instance'] for c in self.columns[1:]))
+
+    def get_time(self) -> np.ndarray:
+        return np.array(self.data[:, 0])
+
+    def get_column_index(self, model_instance_id: str, output_id: str) -> int:
+        name = f"{model_instance_id}/{output_id}"
+        if name not in self._index:
+            raise KeyError(f"No results for output [{output_id}] of model instance [{model_instance_id}].")
+        return self._index[name]
+
+    def get_values(self, model_instance_id: str, output_id: str) -> np.ndarray:
+        return np.array(self.data[:, self.get_column_index(model_instance_id, output_id)])
+
+    def get_unit(self, model_instance_id: str, output_id: str) -> str | None:
+        return self.columns[self.get_column_index(model_instance_id, output_id)]['unit']
+
+    def get_summary(self, model_instance_id: str, output_id: str) -> dict[str, float] | None:
+        """Returns the AUC, maximum and final value of an output, if these
+        were recorded."""
+        return self.columns[self.get_column_index(model_instance_id, output_id)].get('summary')
+
+    def get_summary_records(self) -> dict[str, list[dict]]:
+        """Returns the recorded summary metrics per output, with a record per
+        model instance."""
+        records = {}
+        for column in self.columns[1:]:
+            if 'summary' in column:
+                records.setdefault(column['output'], []).append({
+                    'model_instance': column['model_instance'],
+                    'unit': column['unit'],
+                    **column['summary']
+                })
+        return records
+
+def plot_scenario_results(config, scenario, out_path: str):
+    """Plots the time courses of all model instances for each output of the
+    scenario, reading only the columns of the plotted output."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    results = ScenarioResults(out_path, scenario.id)
+    if results.header['num_times'] == 0:
+        # Summary only recording
+        return
+    time = results.get_time()
+    labels = { m.id: m.label for m in config.model_instances }
+    for output in scenario.outputs:
+        fig, ax = plt.subplots(figsize=(8, 5))
+        units = set()
+        for model_instance_id in results.model_instance_ids:
+            units.add(results.get_unit(model_instance_id, output.id))
+            ax.plot(
+                time,
+                results.get_values(model_instance_id, output.id),
+                label=labels.get(model_instance_id, model_instance_id)
+            )
+        ax.set_xlabel(f"Time ({scenario.time_unit.value})")
+        unit = units.pop() if len(units) == 1 else None
+        ax.set_ylabel(f"{output.label} ({unit})" if unit else output.label)
+        ax.legend()
+        fig.tight_layout()
+        fig.savefig(os.path.join(out_path, f"{scenario.id}_{output.id}.png"))
+        plt.close(fig)
@@ -0,0 +1,185 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from sbmlpbkutils import load_config
+from simulation.config import load_scenario_extensions
+from simulation.engine import get_simulator, get_steady_state_options, get_solver
+from simulation.population import simulate_individuals
+
+DEFAULT_RELATIVE_STEP = 0.01
+DEFAULT_BATCH_SIZE = 20
+METHODS = ['central', 'forward']
+
+# Summary metrics of the output time courses for which sensitivities are
+# reported
+METRICS = ['auc', 'max', 'final']
+
+def load_sensitivity_specs(config_file: str) -> dict[str, dict]:
+    """Returns the sensitivity analysis specifications of the scenarios of a
+    simulation config file, keyed by scenario id. A scenario with
+    `sensitivity: true` uses the default settings."""
+    return {
+        scenario_id: extensions['sensitivity'] if isinstance(extensions['sensitivity'], dict) else {}
+        for scenario_id, extensions in load_scenario_extensions(config_file).items()
+        if extensions.get('sensitivity')
+    }
+
+@dataclass
+class SensitivityResult:
+    model_instance_id: str
+    output_ids: list[str]
+    parameter_ids: list[str]
+    # Base values of the parameters
+    parameter_values: np.ndarray
+    # Normalized sensitivities (parameters x metrics x outputs)
+    values: np.ndarray
+
+def get_metrics(time: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Returns the summary metrics of output time courses (... x times x
+    outputs) as an array (... x metrics x outputs)."""
+    return np.stack([
+        np.sum((values[..., 1:, :] + values[..., :-1, :]) / 2 * np.diff(time)[:, None], axis=-2),
+        np.max(values, axis=-2),
+        values[..., -1, :]
+    ], axis=-2)
+
+def simulate_metrics(
+    config_file: str,
+    model_instance_id: str,
+    scenario_id: str,
+    parameter_ids: list[str],
+    samples: np.ndarray,
+    time: np.ndarray
+) -> np.ndarray:
+    """Simulates a batch of parameter sets with the loaded simulator of this
+    process. Returns the metrics of each simulation (samples x metrics x
+    outputs), so that only these are sent back to the parent process."""
+    values, _ = simulate_individuals(config_file, model_instance_id, scenario_id, parameter_ids, samples)
+    return get_metrics(time, values)
+
+def get_perturbations(
+    base_values: np.ndarray,
+    relative_step: float,
+    method: str
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the perturbed parameter sets, with each parameter increased
+    (and, for central differences, decreased) by the relative step while the
+    others keep their base value, and the relative step of each set."""
+    num_parameters = len(base_values)
+    directions = [1., -1.] if method == 'central' else [1.]
+    samples = []
+    steps = []
+    for direction in directions:
+        factors = np.ones((num_parameters, num_parameters))
+        np.fill_diagonal(factors, 1. + direction * relative_step)
+        samples.append(base_values * factors)
+        steps.append(np.full(num_parameters, direction * relative_step))
+    return np.concatenate(samples), np.concatenate(steps)
+
+def run_sensitivity_analysis(
+    config_file: str,
+    scenario_id: str,
+    spec: dict,
+    jobs: int = 1
+) -> list[SensitivityResult]:
+    """Computes the normalized local sensitivities (d ln y / d ln p) of the
+    AUC, maximum and final value of each output of a scenario to the
+    parameters of each model instance, using finite differences. The
+    perturbed parameter sets are simulated in batches, across worker
+    processes if jobs > 1, each of which reuses its loaded model instances."""
+    config = load_config(config_file)
+    scenario = next(s for s in config.scenarios if s.id == scenario_id)
+    relative_step = float(spec.get('relative_step', DEFAULT_RELATIVE_STEP))
+    method = str(spec.get('method', 'central')).lower()
+    if method not in METHODS:
+        raise ValueError(f"Unknown sensitivity method [{method}], expected one of {METHODS}.")
+    batch_size = int(spec.get('batch_size', DEFAULT_BATCH_SIZE))
+    extensions = load_scenario_extensions(config_file).get(scenario_id, {})
+
+    results = []
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    try:
+        for model_instance in config.model_instances:
+            _, simulator = get_simulator(config_file, model_instance.id)
+
+            # Parameters of the parameterisation (unless specified), with the
+            # scenario parameters overriding their base values
+            scenario_parameters = getattr(scenario, 'parameters', None) or {}
+            parameter_ids = list(spec.get('parameters') or simulator.parameters.keys())
+            base_values = np.array([
+                scenario_parameters.get(parameter_id, simulator.get_parameter_value(parameter_id))
+                for parameter_id in parameter_ids
+            ], dtype=float)
+
+            # Same settings as the perturbed simulations, so that differences
+            # are not affected by the steady state extrapolation
+            reference = simulator.simulate(
+                scenario,
+                steady_state=get_steady_state_options(extensions),
+                solver=get_solver(extensions)
+            )
+            base = get_metrics(reference.time, reference.values)
+
+            samples, steps = get_perturbations(base_values, relative_step, method)
+            batches = [samples[i:i + batch_size] for i in range(0, len(samples), batch_size)]
+            args = (config_file, model_instance.id, scenario_id, parameter_ids)
+            if executor is not None:
+                batch_results = executor.map(
+                    simulate_metrics,
+                    *zip(*[args + (b, reference.time) for b in batches])
+                )
+            else:
+                batch_results = (simulate_metrics(*args, b, reference.time) for b in batches)
+            metrics = np.concatenate(list(batch_results))
+
+            # Normalized sensitivity; undefined (NaN) for parameters or
+            # metrics with value zero
+            with np.errstate(divide='ignore', invalid='ignore'):
+                relative_change = (metrics - base) / base
+                sensitivities = relative_change / steps[:, None, None]
+            num_parameters = len(parameter_ids)
+            if method == 'central':
+                sensitivities = (sensitivities[:num_parameters] + sensitivities[num_parameters:]) / 2
+            sensitivities[base_values == 0] = np.nan
+
+            results.append(SensitivityResult(
+                model_instance_id=model_instance.id,
+                output_ids=reference.output_ids,
+                parameter_ids=parameter_ids,
+                parameter_values=base_values,
+                values=sensitivities
+            ))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return results
+
+def write_sensitivity_results(results: list[SensitivityResult], out_file: str):
+    """Writes the sensitivities to a CSV file with one row per model instance,
+    output and parameter, and one column per metric."""
+    frames = []
+    for result in results:
+        for j, output_id in enumerate(result.output_ids):
+            frame = pd.DataFrame({
+                'model_instance': result.model_instance_id,
+                'output': output_id,
+                'parameter': result.parameter_ids,
+                'value': result.parameter_values
+            })
+            for k, metric in enumerate(METRICS):
+                frame[metric] = result.values[:, k, j]
+            frames.append(frame)
+    os.makedirs(os.path.dirname(out_file) or '.', exist_ok=True)
+    pd.concat(frames).to_csv(out_file, index=False, float_format='%.6g')
+
+def get_top_sensitivities(results_file: str, top: int = 10) -> dict[str, list[dict]]:
+    """Returns, per output, the parameters with the largest absolute AUC
+    sensitivity of each model instance."""
+    df = pd.read_csv(results_file)
+    records = {}
+    for (output_id, _), df_group in df.groupby(['output', 'model_instance'], sort=False):
+        index = df_group['auc'].abs().sort_values(ascending=False).index[:top]
+        records.setdefault(output_id, []).extend(df_group.loc[index].to_dict('records'))
+    return records
@@ -0,0 +1,222 @@
+import io
+import os
+import json
+import time
+import zipfile
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from sbmlpbkutils import load_config
+from simulation.config import load_scenario_extensions
+from simulation.engine import get_model_instance_key, get_model_instance_simulator, get_num_simulators, \
+    get_steady_state_options, get_solver
+from simulation.recording import get_recording_options
+from simulation.results import get_results_data
+
+# Latencies of the most recent requests kept for the metrics
+MAX_LATENCY_SAMPLES = 10000
+LATENCY_PERCENTILES = [50, 95, 99]
+
+def find_model_instances(config_files: list[str]) -> list:
+    """Returns the distinct model instances (by model file, parameterisation
+    and target mappings) of the simulation configs."""
+    model_instances = {}
+    for config_file in config_files:
+        for model_instance in load_config(config_file).model_instances:
+            model_instances.setdefault(get_model_instance_key(model_instance), model_instance)
+    return list(model_instances.values())
+
+def preload_models(config_files: list[str], logger=None):
+    """Loads the simulators of all model instances of the configs in this
+    worker process (process pool initializer). Models that cannot be loaded
+    (e.g., not compiled) are skipped with a warning; requests using them
+    report the error."""
+    for model_instance in find_model_instances(config_files):
+        try:
+            get_model_instance_simulator(model_instance)
+        except Exception as error:
+            if logger is not None:
+                logger.warning(
+                    "Failed to load model [%s] of model instance [%s]: %s",
+                    model_instance.model_path,
+                    model_instance.id,
+                    error
+                )
+
+def get_num_models() -> int:
+    return get_num_simulators()
+
+def simulate_request(config_text: str, scenario_ids: list[str] = None) -> tuple[list, dict]:
+    """Simulates the scenarios of a config (YAML or JSON text in the
+    simulation config schema) with the loaded simulators of this process.
+    Returns the header and data array of the results of each scenario, and
+    the durations (in seconds) of the stages of the request."""
+    timings = { 'start': time.time() }
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_file = os.path.join(tmp_dir, 'config.yaml')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(config_text)
+        config = load_config(config_file)
+        extensions = load_scenario_extensions(config_file)
+    scenarios = [s for s in config.scenarios if not scenario_ids or s.id in scenario_ids]
+    missing = set(scenario_ids or []) - { s.id for s in scenarios }
+    if missing:
+        raise ValueError(f"Scenarios {sorted(missing)} not found in config [{config.id}].")
+    timings['parse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    simulators = { m.id: get_model_instance_simulator(m) for m in config.model_instances }
+    timings['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = []
+    for scenario in scenarios:
+        scenario_results = []
+        for model_instance in config.model_instances:
+            simulator = simulators[model_instance.id]
+            scenario_extensions = extensions.get(scenario.id, {})
+            result = simulator.simulate(
+                scenario,
+                steady_state=get_steady_state_options(scenario_extensions),
+                solver=get_solver(scenario_extensions),
+                recording=get_recording_options(scenario_extensions)
+            )
+            result.model_instance_id = model_instance.id
+            scenario_results.append(result)
+        results.append(get_results_data(scenario, scenario_results))
+    timings['simulate'] = time.perf_counter() - start
+    return results, timings
+
+def encode_results(results: list[tuple[dict, np.ndarray]]) -> bytes:
+    """Encodes the results of the scenarios as an (uncompressed) zip archive
+    with the same files as written by write_scenario_results: a JSON header
+    and a NumPy array per scenario."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for header, data in results:
+            archive.writestr(f"{header['scenario']}.results.json", json.dumps(header))
+            array_buffer = io.BytesIO()
+            np.save(array_buffer, data)
+            archive.writestr(header['data_file'], array_buffer.getvalue())
+    return buffer.getvalue()
+
+class LatencyMetrics:
+    """Request counts and latency percentiles per stage of the most recent
+    requests. Thread safe."""
+
+    def __init__(self, max_samples: int = MAX_LATENCY_SAMPLES):
+        self.lock = threading.Lock()
+        self.max_samples = max_samples
+        self.stages = {}
+        self.requests = 0
+        self.errors = 0
+
+    def add(self, timings: dict[str, float], error: bool = False):
+        with self.lock:
+            self.requests += 1
+            self.errors += int(error)
+            for stage, duration in timings.items():
+                self.stages.setdefault(stage, deque(maxlen=self.max_samples)).append(duration)
+
+    def get_summary(self) -> dict:
+        with self.lock:
+            stages = { stage: np.array(values) for stage, values in self.stages.items() }
+            summary = { 'requests': self.requests, 'errors': self.errors, 'latency_ms': {} }
+        for stage, values in stages.items():
+            values = values * 1000.
+            summary['latency_ms'][stage] = {
+                'count': len(values),
+                'mean': float(np.mean(values)),
+                **{ f"p{p}": float(np.percentile(values, p)) for p in LATENCY_PERCENTILES },
+                'max': float(np.max(values))
+            }
+        return summary
+
+class SimulationService(ThreadingHTTPServer):
+    """Local HTTP service that simulates scenario requests with a pool of
+    worker processes, each of which preloaded the model instances of the
+    simulation configs."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], config_files: list[str], jobs: int = 1, logger=None):
+        self.config_files = config_files
+        self.jobs = jobs
+        self.logger = logger
+        self.metrics = LatencyMetrics()
+        self.executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=preload_models,
+            initargs=(config_files, logger)
+        )
+        # Start all workers before accepting requests, so that no request
+        # pays for loading the models
+        self.num_models = max(f.result() for f in [self.executor.submit(get_num_models) for _ in range(jobs)])
+        super().__init__(address, SimulationRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown()
+
+class SimulationRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/metrics':
+            self.send_json(200, self.server.metrics.get_summary())
+        elif path == '/health':
+            self.send_json(200, {
+                'configs': len(self.server.config_files),
+                'workers': self.server.jobs,
+                'models': self.server.num_models
+            })
+        else:
+            self.send_json(404, { 'error': f"Unknown path [{path}]." })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/simulate':
+            self.send_json(404, { 'error': f"Unknown path [{url.path}]." })
+            return
+        received = time.time()
+        start = time.perf_counter()
+        config_text = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+        scenario_ids = parse_qs(url.query).get('scenario')
+        try:
+            results, timings = self.server.executor.submit(simulate_request, config_text, scenario_ids).result()
+        except Exception as error:
+            self.server.metrics.add({ 'total': time.perf_counter() - start }, error=True)
+            self.send_json(400, { 'error': str(error) })
+            return
+        timings['queue'] = max(0., timings.pop('start') - received)
+        encode_start = time.perf_counter()
+        body = encode_results(results)
+        timings['encode'] = time.perf_counter() - encode_start
+        timings['total'] = time.perf_counter() - start
+        self.server.metrics.add(timings)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/zip')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Server-Timing', ', '.join(
+            f"{stage};dur={duration * 1000.:.3f}" for stage, duration in timings.items()
+        ))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, data: dict):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.logger is not None:
+            self.server.logger.debug("%s %s", self.address_string(), format % args)
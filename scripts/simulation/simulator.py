@@ -0,0 +1,53 @@
+import os
+import json
+from pathlib import Path
+import roadrunner
+from cache.manifest import file_hash
+
+def get_state_file(sbml_file: str | Path) -> Path:
+    return Path(sbml_file).with_suffix('.rrstate')
+
+def get_simulator_key(sbml_file: str | Path) -> dict[str, str]:
+    """Returns the key for which a saved simulator state of the SBML file is
+    valid: the hash of the SBML file and the simulator version."""
+    return {
+        'sbml': file_hash(sbml_file),
+        'roadrunner': getattr(roadrunner, '__version__', 'unknown')
+    }
+
+def load_simulator(sbml_file: str | Path, use_cache: bool = True) -> roadrunner.RoadRunner:
+    """Loads a simulator for the SBML file. The compiled simulator state is
+    restored from the state file next to the model if it is still valid;
+    otherwise the model is parsed and compiled, and its state is saved."""
+    state_file = get_state_file(sbml_file)
+    info_file = state_file.with_suffix('.rrstate.json')
+    if use_cache and state_file.exists() and info_file.exists():
+        try:
+            with open(info_file, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            if info == get_simulator_key(sbml_file):
+                rr = roadrunner.RoadRunner()
+                rr.loadState(str(state_file))
+                return rr
+        except Exception:
+            # Unreadable or incompatible state: recompile below
+            pass
+    rr = roadrunner.RoadRunner(str(sbml_file))
+    if use_cache:
+        save_simulator_state(rr, sbml_file)
+    return rr
+
+def save_simulator_state(rr: roadrunner.RoadRunner, sbml_file: str | Path):
+    """Saves the state of a freshly loaded simulator of the SBML file to the
+    state file next to the model."""
+    state_file = get_state_file(sbml_file)
+    info_file = state_file.with_suffix('.rrstate.json')
+    # Write to temporary files first, so that concurrent readers never see a
+    # partially written state
+    tmp_state_file = state_file.with_name(f"{state_file.name}.{os.getpid()}.tmp")
+    tmp_info_file = info_file.with_name(f"{info_file.name}.{os.getpid()}.tmp")
+    rr.saveState(str(tmp_state_file))
+    with open(tmp_info_file, 'w', encoding='utf-8') as f:
+        json.dump(get_simulator_key(sbml_file), f)
+    os.replace(tmp_state_file, state_file)
+    os.replace(tmp_info_file, info_file)
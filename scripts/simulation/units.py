@@ -0,0 +1,141 @@
+import enum
+import libsbml as ls
+
+# Scenario time units expressed in seconds
+TIME_UNITS = {
+    'SECOND': 1.,
+    'MINUTE': 60.,
+    'HOUR': 3600.,
+    'DAY': 86400.,
+    'WEEK': 7 * 86400.,
+    'YEAR': 365.25 * 86400.
+}
+
+# Scenario amount units expressed in grams (mass) or moles (substance)
+MASS_UNITS = {
+    'KILOGRAMS': 1e3,
+    'GRAMS': 1.,
+    'MILLIGRAMS': 1e-3,
+    'MICROGRAMS': 1e-6,
+    'NANOGRAMS': 1e-9,
+    'PICOGRAMS': 1e-12
+}
+SUBSTANCE_UNITS = {
+    'MOLES': 1.,
+    'MILLIMOLES': 1e-3,
+    'MICROMOLES': 1e-6,
+    'NANOMOLES': 1e-9,
+    'PICOMOLES': 1e-12
+}
+
+def get_unit_name(unit) -> str:
+    if isinstance(unit, enum.Enum):
+        return unit.name.upper()
+    return str(unit).upper()
+
+def get_unit_scale(model: ls.Model, unit_id: str, kind: int) -> float | None:
+    """Returns the scale of the unit with the specified id relative to the
+    base unit of the specified kind (second, gram or mole), or None if the
+    unit is not set or is not of this kind."""
+    if not unit_id:
+        return None
+    unit_definition = model.getUnitDefinition(unit_id)
+    if unit_definition is None:
+        base_units = {
+            'second': (ls.UNIT_KIND_SECOND, 1.),
+            'gram': (ls.UNIT_KIND_GRAM, 1.),
+            'kilogram': (ls.UNIT_KIND_GRAM, 1e3),
+            'mole': (ls.UNIT_KIND_MOLE, 1.)
+        }
+        base_kind, scale = base_units.get(unit_id, (None, None))
+        return scale if base_kind == kind else None
+    scale = 1.
+    has_kind = False
+    for i in range(unit_definition.getNumUnits()):
+        unit = unit_definition.getUnit(i)
+        unit_kind = unit.getKind()
+        if unit_kind == ls.UNIT_KIND_DIMENSIONLESS:
+            base = 1.
+        elif unit_kind == ls.UNIT_KIND_KILOGRAM and kind == ls.UNIT_KIND_GRAM:
+            base = 1e3
+            has_kind = True
+        elif unit_kind == kind:
+            base = 1.
+            has_kind = True
+        else:
+            return None
+        scale *= (base * unit.getMultiplier() * 10 ** unit.getScale()) ** unit.getExponentAsDouble()
+    return scale if has_kind else None
+
+def get_time_conversion_factor(model: ls.Model, time_unit) -> float:
+    """Returns the factor converting scenario time to model time. If the
+    model time unit is not specified, the scenario time unit is assumed."""
+    scenario_scale = TIME_UNITS.get(get_unit_name(time_unit))
+    if scenario_scale is None:
+        raise ValueError(f"Unsupported scenario time unit [{time_unit}].")
+    model_scale = get_unit_scale(model, model.getTimeUnits(), ls.UNIT_KIND_SECOND)
+    if model_scale is None:
+        return 1.
+    return scenario_scale / model_scale
+
+def get_amount_conversion_factor(
+    model: ls.Model,
+    amount_unit,
+    molar_mass: float = None
+) -> float:
+    """Returns the factor converting scenario amounts to model substance
+    amounts. Conversions between mass and moles use the molar mass (g/mol).
+    If the model substance unit is not specified, the scenario amount unit
+    is assumed."""
+    unit_name = get_unit_name(amount_unit)
+    substance_units = model.getSubstanceUnits()
+    model_mass_scale = get_unit_scale(model, substance_units, ls.UNIT_KIND_GRAM)
+    model_mole_scale = get_unit_scale(model, substance_units, ls.UNIT_KIND_MOLE)
+    if unit_name in MASS_UNITS:
+        if model_mass_scale is not None:
+            return MASS_UNITS[unit_name] / model_mass_scale
+        if model_mole_scale is not None:
+            if not molar_mass:
+                raise ValueError(
+                    f"Molar mass required to convert [{amount_unit}] to model substance unit [{substance_units}]."
+                )
+            return MASS_UNITS[unit_name] / molar_mass / model_mole_scale
+    elif unit_name in SUBSTANCE_UNITS:
+        if model_mole_scale is not None:
+            return SUBSTANCE_UNITS[unit_name] / model_mole_scale
+        if model_mass_scale is not None:
+            if not molar_mass:
+                raise ValueError(
+                    f"Molar mass required to convert [{amount_unit}] to model substance unit [{substance_units}]."
+                )
+            return SUBSTANCE_UNITS[unit_name] * molar_mass / model_mass_scale
+    else:
+        raise ValueError(f"Unsupported scenario amount unit [{amount_unit}].")
+    return 1.
+
+def get_unit_label(model: ls.Model, unit_id: str) -> str | None:
+    if not unit_id:
+        return None
+    unit_definition = model.getUnitDefinition(unit_id)
+    if unit_definition is not None and unit_definition.getName():
+        return unit_definition.getName()
+    return unit_id
+
+def get_selection_unit(model: ls.Model, selection: str) -> str | None:
+    """Returns the (model) unit of a simulator selection: the substance unit
+    for species amounts (X), substance per volume unit for species
+    concentrations ([X]), or the unit of a parameter or compartment."""
+    symbol = selection[1:-1] if selection.startswith('[') and selection.endswith(']') else selection
+    species = model.getSpecies(symbol)
+    if species is not None:
+        substance_unit = get_unit_label(model, species.getSubstanceUnits() or model.getSubstanceUnits())
+        if symbol == selection:
+            return substance_unit
+        compartment = model.getCompartment(species.getCompartment())
+        volume_unit = get_unit_label(
+            model,
+            (compartment.getUnits() if compartment is not None else '') or model.getVolumeUnits()
+        )
+        return f"{substance_unit}/{volume_unit}" if substance_unit and volume_unit else None
+    element = model.getParameter(symbol) or model.getCompartment(symbol)
+    return get_unit_label(model, element.getUnits()) if element is not None else None
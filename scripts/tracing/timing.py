@@ -0,0 +1,12 @@
+import time
+
+def time_best(func, repeat: int) -> tuple[float, object]:
+    """Returns the fastest wall time of repeated calls of func, and the result
+    of the last call."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
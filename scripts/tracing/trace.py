@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Folder to which the processes of a traced run append their spans. It is set
+# in the environment, so that worker processes inherit it.
+TRACE_DIR_ENV = 'PBK_TRACE_DIR'
+
+# Items (e.g., models or scenarios) of the open spans of this process
+_open_items = []
+
+def enable_tracing() -> str:
+    trace_dir = tempfile.mkdtemp(prefix='pbk-trace-')
+    os.environ[TRACE_DIR_ENV] = trace_dir
+    return trace_dir
+
+def is_tracing_enabled() -> bool:
+    return bool(os.environ.get(TRACE_DIR_ENV))
+
+@contextmanager
+def span(name: str, item: str = None, **args):
+    """Records the wall time of the enclosed block as a span of the specified
+    name (e.g., the pipeline stage) and item (e.g., the model file), if
+    tracing is enabled. Spans are written immediately, so that spans of
+    worker processes are not lost when these exit."""
+    trace_dir = os.environ.get(TRACE_DIR_ENV)
+    if not trace_dir:
+        yield
+        return
+    # Spans within a span of the same item do not add to its total time
+    nested = item is not None and item in _open_items
+    _open_items.append(item)
+    start = time.time_ns()
+    start_counter = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter_ns() - start_counter
+        _open_items.pop()
+        event = {
+            'name': name,
+            'cat': 'nested' if nested else 'span',
+            'ph': 'X',
+            'ts': start / 1000,
+            'dur': duration / 1000,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': { 'item': item, **args } if item is not None else args
+        }
+        with open(os.path.join(trace_dir, f"{os.getpid()}.jsonl"), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(event, default=str) + '\n')
+
+def finish_tracing(trace_file: str, logger: logging.Logger, top: int = 10):
+    """Collects the spans of all processes into a Chrome trace file (which
+    can be opened in chrome://tracing or Perfetto) and logs a summary of the
+    slowest stages and items."""
+    trace_dir = os.environ.pop(TRACE_DIR_ENV, None)
+    if not trace_dir:
+        return
+    events = []
+    for name in sorted(os.listdir(trace_dir)):
+        with open(os.path.join(trace_dir, name), 'r', encoding='utf-8') as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+    shutil.rmtree(trace_dir, ignore_errors=True)
+    events.sort(key=lambda e: e['ts'])
+    os.makedirs(os.path.dirname(os.path.abspath(trace_file)), exist_ok=True)
+    with open(trace_file, 'w', encoding='utf-8') as f:
+        json.dump({ 'traceEvents': events, 'displayTimeUnit': 'ms' }, f)
+    logger.info("Wrote %d trace spans to [%s].", len(events), trace_file)
+    log_trace_summary(events, logger, top)
+
+def log_trace_summary(events: list[dict], logger: logging.Logger, top: int = 10):
+    stages = {}
+    for event in events:
+        count, total, longest = stages.get(event['name'], (0, 0., 0.))
+        seconds = event['dur'] / 1e6
+        stages[event['name']] = (count + 1, total + seconds, max(longest, seconds))
+    items = {}
+    for event in events:
+        item = event['args'].get('item')
+        if item is not None and event['cat'] != 'nested':
+            items[item] = items.get(item, 0.) + event['dur'] / 1e6
+
+    logger.info("Slowest stages (total over all processes):")
+    logger.info("  %-24s %8s %10s %10s", 'Stage', 'Count', 'Total', 'Max')
+    for name, (count, total, longest) in sorted(stages.items(), key=lambda x: -x[1][1])[:top]:
+        logger.info("  %-24s %8d %9.2fs %9.2fs", name, count, total, longest)
+    if items:
+        logger.info("Slowest items:")
+        for item, total in sorted(items.items(), key=lambda x: -x[1])[:top]:
+            logger.info("  %9.2fs  %s", total, item)